@@ -52,7 +52,6 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
 
     markdownify_text = markdownify(f"Hello {update.message.from_user.first_name}!")
-    print(markdownify_text)
 
     return await update.message.reply_markdown_v2(markdownify_text)
 
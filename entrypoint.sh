@@ -24,6 +24,15 @@ fi
 
 flask create-schema
 flask db upgrade
+flask create-indexes
 
 # Start app and bot
-python app.py & python bot.py
\ No newline at end of file
+# A single gthread worker keeps the in-process webhook queue and session
+# debounce timers shared, while its threads overlap the blocking MinIO,
+# database and inference I/O of concurrent requests
+gunicorn app:app \
+    --bind 0.0.0.0:5000 \
+    --worker-class gthread \
+    --workers 1 \
+    --threads "${GUNICORN_THREADS:-32}" \
+    --keep-alive 5 & python bot.py
\ No newline at end of file
@@ -1,4 +1,7 @@
 from datetime import datetime, timedelta
+import logging
+import threading
+import click
 import pytz
 
 from flask import Blueprint, request, jsonify, current_app, Flask
@@ -8,19 +11,44 @@ from flask_cors import CORS
 from src.config.app_config import AppConfig
 from src.config.database import db, migrate
 from src.controllers import auth_bp, analysis_bp, video_bp, minio_hook_bp
-from src.utils import setup_logging
+from src.utils import ORJSONProvider, setup_logging
 from src import cli
 from src.config.dev_config import DevConfig
 from src.config.production_config import ProductionConfig
-from src.services.analysis_bucket_minio import get_detailed_analysis_data
+from src.services.analysis_bucket_minio import (
+    ensure_analysis_bucket,
+    get_detailed_analysis_data,
+)
+from src.services.minio import ensure_bucket
+from src.services.summary_bucket_minio import ensure_summary_bucket
 from src.models import User
 
 
+logger = logging.getLogger(__name__)
+
 app_configuration = DevConfig()
 
+
+def _prepare_buckets():
+    """Check the MinIO buckets once so the first requests skip the round trip"""
+    try:
+        ensure_bucket("videos")
+        ensure_analysis_bucket()
+        ensure_summary_bucket()
+    except Exception as e:
+        logger.warning("Could not prepare MinIO buckets at startup: %s", e)
+
+
+def _loaded_by_cli():
+    """Whether the app is being created for a flask CLI command"""
+    return click.get_current_context(silent=True) is not None
+
 def create_app():
     """Application factory function"""
     app = Flask(__name__)
+
+    # Serialize JSON responses with orjson
+    app.json = ORJSONProvider(app)
     
     # Setup logging
     setup_logging()
@@ -45,7 +73,9 @@ def create_app():
          origins=cors_config['origins'],
          supports_credentials=cors_config['supports_credentials'],
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-         allow_headers=['Content-Type', 'Authorization'])
+         # The X- headers carry the file metadata for /api/video/upload/stream
+         allow_headers=['Content-Type', 'Authorization',
+                        'X-Session-Id', 'X-Model', 'X-View', 'X-Filename'])
     
     # Import models to ensure they are registered with SQLAlchemy
     from . import models
@@ -58,6 +88,12 @@ def create_app():
     # Register MinIO webhook blueprint
     app.register_blueprint(minio_hook_bp, url_prefix='/api/minio')
 
+    # Warm the bucket cache in the background so startup never waits on MinIO.
+    # CLI commands such as flask db upgrade never touch the buckets, and the
+    # helpers still check a bucket on first use when the warm-up is skipped
+    if not _loaded_by_cli():
+        threading.Thread(target=_prepare_buckets, daemon=True).start()
+
     @app.route("/api/users", methods=["GET"])
     @jwt_required()
     def get_all_users():
@@ -20,7 +20,33 @@ def create_schema():
     db.session.commit()
     click.echo(f'Created {db_config.schema_name} schema.')
 
+@click.command()
+@with_appcontext
+def create_indexes():
+    """Create model indexes missing from the database without blocking writes."""
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    # Migrations are generated per environment, so indexes added to the
+    # models are also created here for databases that already exist.
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        op = Operations(MigrationContext.configure(conn))
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                op.create_index(
+                    index.name,
+                    table.name,
+                    [column.name for column in index.columns],
+                    schema=table.schema,
+                    unique=index.unique,
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
+                click.echo(f'Ensured index {index.name} on {table.name}.')
+
 def init_app(app):
     """Register CLI commands with the Flask app."""
     app.cli.add_command(init_db)
     app.cli.add_command(create_schema)
+    app.cli.add_command(create_indexes)
@@ -5,7 +5,6 @@ import time
 
 from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from google import genai
 
 from src.config.database import db
 from src.config.websocket_config import MODEL_CONFIGS
@@ -19,10 +18,12 @@ from src.services.analysis_bucket_minio import (
     list_analysis_files,
     save_feedback_data,
     get_pdf_report_url,
+    load_json_object,
     save_pdf_report,
 )
+from src.services.gemini import get_client as get_gemini_client
 from src.services.minio import client as minio_client
-from src.services.minio import get_session_presigned_urls
+from src.services.minio import get_session_presigned_urls, read_object
 from src.services.summary_bucket_minio import (
     get_posture_insights,
     get_posture_insights_presigned_url,
@@ -30,7 +31,7 @@ from src.services.summary_bucket_minio import (
     save_posture_insights,
 )
 from src.services.video_upload_analysis_service import delete_session_video_files
-from src.services.pdf_report_generator import generate_pdf_report
+from src.services.pdf_report_generator import spool_pdf_report
 from src.utils.cache import (
     get_cached_presigned_url,
     cache_presigned_url,
@@ -502,7 +503,7 @@ class AnalysisController:
     def _generate_insights_with_gemini(self, weekly_feedback):
         """Generate posture insights using Gemini AI"""
         try:
-            client = genai.Client()
+            client = get_gemini_client()
 
             prompt = (
                 "You are a firearms posture evaluation expert. You are provided with multiple `feedback.json` files from the same user across the current week. Each file contains detailed analysis of that session from one or more views (front, back, left, right).\n\n"
@@ -592,11 +593,12 @@ class AnalysisController:
                     analysis.user_id, analysis.session_id
                 )
 
-                response = minio_client.get_object("analysis-data", feedback_path)
-                feedback_data = json.loads(response.read())
+                feedback_data = load_json_object(
+                    read_object("analysis-data", feedback_path)
+                )
 
-                pdf_bytes = generate_pdf_report(analysis, feedback_data)
-                save_pdf_report(analysis.user_id, analysis.session_id, pdf_bytes)
+                with spool_pdf_report(analysis, feedback_data) as pdf_file:
+                    save_pdf_report(analysis.user_id, analysis.session_id, pdf_file)
                 pdf_url = get_pdf_report_url(analysis.user_id, analysis.session_id)
 
                 return {"url": pdf_url}, 200
@@ -16,6 +16,11 @@ from src.models.user import User
 
 auth_bp = Blueprint("auth", __name__)
 
+# Token lifetimes and claims, built once instead of on every request
+ACCESS_TOKEN_TTL = timedelta(hours=3)
+WS_TOKEN_TTL = timedelta(minutes=5)
+WS_TOKEN_CLAIMS = {"ws_auth": True, "one_time": True}
+
 
 class AuthController:
     """Controller for authentication-related operations"""
@@ -37,7 +42,7 @@ class AuthController:
 
             # Create JWT token
             access_token = create_access_token(
-                identity=str(new_user.id), expires_delta=timedelta(hours=3)
+                identity=str(new_user.id), expires_delta=ACCESS_TOKEN_TTL
             )
 
             return {
@@ -64,7 +69,7 @@ class AuthController:
 
             # Create JWT token
             access_token = create_access_token(
-                identity=str(user.id), expires_delta=timedelta(hours=3)
+                identity=str(user.id), expires_delta=ACCESS_TOKEN_TTL
             )
 
             return {
@@ -121,7 +126,7 @@ def login():
         response.set_cookie(
             "access_token_cookie",
             result["token"],
-            max_age=timedelta(hours=3),
+            max_age=ACCESS_TOKEN_TTL,
             httponly=True,
             secure=False,  # Set to True in production with HTTPS
             samesite="Lax",
@@ -177,17 +182,18 @@ def generate_ws_token():
     """Generate a short-lived one-time token for WebSocket authentication"""
     user_id = get_jwt_identity()
 
+    # Identities are issued as strings, so user_id needs no conversion
     ws_token = create_access_token(
-        identity=str(user_id),
-        expires_delta=timedelta(minutes=5),
-        additional_claims={"ws_auth": True, "one_time": True},
+        identity=user_id,
+        expires_delta=WS_TOKEN_TTL,
+        additional_claims=WS_TOKEN_CLAIMS,
     )
 
     return (
         jsonify(
             {
                 "ws_token": ws_token,
-                "expires_in": 300,
+                "expires_in": int(WS_TOKEN_TTL.total_seconds()),
                 "message": "WebSocket token generated successfully",
             }
         ),
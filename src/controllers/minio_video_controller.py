@@ -1,57 +1,115 @@
 import asyncio
+import functools
+import itertools
 import json
+import logging
 import os
+import queue
+import re
 import tempfile
 import threading
-import traceback
 from datetime import timedelta
 from urllib.parse import unquote
 
+try:
+    import uvloop
+except ImportError:  # uvloop does not support Windows
+    uvloop = None
+
 from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import create_access_token
-from google import genai
+from sqlalchemy import tuple_
 
 from src.config.database import db
-from src.config.websocket_config import WEBSOCKET_HOST
+from src.config.websocket_config import MODEL_CONFIGS, WEBSOCKET_HOST
 from src.models import Analysis, User
-from src.services.analysis_bucket_minio import save_feedback_data, save_pdf_report
+from src.services.analysis_bucket_minio import (
+    save_detailed_analysis_bundle,
+    save_feedback_data,
+    save_pdf_report,
+)
+from src.services.gemini import get_client as get_gemini_client
 from src.services.minio import client as minio_client
+from src.services.minio import read_object
 from src.services.video_upload_analysis_service import MediaAnalysisService
-from src.services.pdf_report_generator import generate_pdf_report
+from src.services.pdf_report_generator import spool_pdf_report
 from src.services.telegram_bot import send_alert_sync
 
 minio_hook_bp = Blueprint("minio_hook", __name__)
 
+logger = logging.getLogger(__name__)
 
-def get_media_analyzer_for_model(model_name, service_token):
-    """Get MediaAnalysisService instance configured for the specified model"""
-    try:
-        from src.config.websocket_config import MODEL_CONFIGS
+# Matches an optional ```json ... ``` fence around the Gemini response body
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```?\s*$", re.DOTALL)
+
+# Matches user_id/session_id/model_view.ext, splitting model on the first "_"
+_MINIO_KEY_RE = re.compile(r"^([^/]+)/([^/]+)/([^_/]+)_([^/]*?)(?:\.[^./]*)?$")
+
+# Extensions that are analyzed as single images rather than videos
+INFERENCE_IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png"})
+
+# Delay before processing a session, to allow all files to be uploaded
+SESSION_PROCESSING_DELAY = 2.0
+
+# Webhook jobs are queued and handled by a small worker pool so the
+# request thread only has to parse the notification and acknowledge it
+WEBHOOK_WORKERS = 4
+_webhook_jobs = queue.Queue(maxsize=1024)
+_webhook_workers_started = False
+_webhook_workers_lock = threading.Lock()
+
+# Pending debounce timers keyed by (user_id, session_id, model_name)
+_pending_sessions = {}
+_pending_sessions_lock = threading.Lock()
 
-        if model_name not in MODEL_CONFIGS:
-            print(f"Error: Model '{model_name}' not found in configuration")
-            return None
 
-        model_config = MODEL_CONFIGS[model_name]
+@functools.lru_cache(maxsize=16)
+def _resolve_model(model_name):
+    """Resolve a model name to its (checkpoint_path, port), or None if unavailable"""
+    model_config = MODEL_CONFIGS.get(model_name)
 
-        if (
-            model_config.get("model_config") is None
-            or model_config.get("checkpoint_path") is None
-        ):
-            print(f"Error: Model '{model_name}' is not properly configured")
+    if model_config is None:
+        logger.error("Model '%s' not found in configuration", model_name)
+        return None
+
+    if (
+        model_config.get("model_config") is None
+        or model_config.get("checkpoint_path") is None
+    ):
+        logger.error("Model '%s' is not properly configured", model_name)
+        return None
+
+    return model_config["checkpoint_path"], model_config.get("port", 8894)
+
+
+def get_media_analyzer_for_model(model_name, token_factory):
+    """
+    Get MediaAnalysisService instance configured for the specified model
+
+    token_factory is called for a new service token each time the analyzer
+    connects to the inference service.
+    """
+    try:
+        resolved = _resolve_model(model_name)
+        if resolved is None:
             return None
 
-        websocket_port = model_config.get("port", 8894)
-        print(f"Using model '{model_name}' on port {websocket_port}")
+        checkpoint_path, websocket_port = resolved
+        logger.info(
+            "Using model '%s' (%s) on port %s",
+            model_name,
+            checkpoint_path,
+            websocket_port,
+        )
 
         return MediaAnalysisService(
             websocket_host=WEBSOCKET_HOST,
             websocket_port=websocket_port,
-            service_token=service_token,
+            token_factory=token_factory,
         )
 
     except Exception as e:
-        print(f"Error getting media analyzer for model {model_name}: {str(e)}")
+        logger.error("Error getting media analyzer for model %s: %s", model_name, e)
         return None
 
 
@@ -59,41 +117,74 @@ def parse_minio_key(key):
     """Parse MinIO key to extract user_id, session_id, view, and model_name"""
     try:
         decoded_key = unquote(key)
-        print(f"Parsing key: {decoded_key}")
-
-        parts = decoded_key.split("/")
-
-        if len(parts) == 3:  # user_id/session_id/model_view.ext
-            user_id, session_id, filename = parts
-            base_name = os.path.splitext(filename)[0]
-
-            if "_" in base_name:
-                model_name, view = base_name.split("_", 1)
-                print(
-                    f"Parsed: user_id={user_id}, session_id={session_id}, view={view}, model={model_name}"
-                )
-                return user_id, session_id, view, model_name
+        logger.debug("Parsing key: %s", decoded_key)
+
+        match = _MINIO_KEY_RE.match(decoded_key)
+        if match:
+            user_id, session_id, model_name, view = match.groups()
+            logger.debug(
+                "Parsed: user_id=%s, session_id=%s, view=%s, model=%s",
+                user_id,
+                session_id,
+                view,
+                model_name,
+            )
+            return user_id, session_id, view, model_name
 
-        print(f"Invalid key format: {key}")
+        logger.warning("Invalid key format: %s", key)
         return None, None, None, None
 
     except Exception as e:
-        print(f"Error parsing key {key}: {str(e)}")
+        logger.error("Error parsing key %s: %s", key, e)
         return None, None, None, None
 
 
-def run_inference_on_media(file_path, view, model_name, user_id=None, session_id=None):
-    """Run pose inference on media file using WebSocket service"""
+def new_inference_loop():
+    """Create an event loop for inference, backed by uvloop when it is installed"""
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def create_service_token():
+    """Create a short-lived WebSocket token authenticating the webhook service"""
+    return create_access_token(
+        identity="webhook_service",
+        expires_delta=timedelta(minutes=5),
+        additional_claims={"ws_auth": True, "one_time": True},
+    )
+
+
+def create_service_analyzer(model_name):
+    """Get a MediaAnalysisService for the model, authenticated as the webhook service"""
+    # A session can outlive one token, so each connection mints its own
+    return get_media_analyzer_for_model(model_name, create_service_token)
+
+
+def run_inference_on_media(
+    file_path,
+    view,
+    model_name,
+    user_id=None,
+    session_id=None,
+    file_data=None,
+    analyzer=None,
+    loop=None,
+):
+    """
+    Run pose inference on media file using WebSocket service
+
+    If file_data is given it holds the encoded image bytes and file_path is
+    only used to determine the file type. An analyzer and the event loop it
+    runs on can be passed in to reuse one inference connection across files;
+    otherwise both are created for this call and closed afterwards.
+    """
     try:
-        print(f"Starting inference for: {file_path} with model {model_name}")
+        logger.info("Starting inference for: %s with model %s", file_path, model_name)
 
-        # Create a WebSocket token with proper claims for authentication
-        service_token = create_access_token(
-            identity="webhook_service",
-            expires_delta=timedelta(minutes=5),
-            additional_claims={"ws_auth": True, "one_time": True},
-        )
-        analyzer = get_media_analyzer_for_model(model_name, service_token)
+        owns_analyzer = analyzer is None
+        if owns_analyzer:
+            analyzer = create_service_analyzer(model_name)
 
         if analyzer is None:
             return {"error": f"Model '{model_name}' not available", "view": view}
@@ -101,12 +192,15 @@ def run_inference_on_media(file_path, view, model_name, user_id=None, session_id
         file_extension = os.path.splitext(file_path)[1].lower()
 
         try:
-            loop = asyncio.new_event_loop()
+            if owns_analyzer:
+                loop = new_inference_loop()
             asyncio.set_event_loop(loop)
 
-            if file_extension in [".jpg", ".jpeg", ".png"]:
+            if file_extension in INFERENCE_IMAGE_EXTENSIONS:
                 result = loop.run_until_complete(
-                    analyzer.analyze_image(file_path, view, user_id, session_id)
+                    analyzer.analyze_image(
+                        file_path, view, user_id, session_id, image_data=file_data
+                    )
                 )
             else:
                 result = loop.run_until_complete(
@@ -114,7 +208,9 @@ def run_inference_on_media(file_path, view, model_name, user_id=None, session_id
                 )
 
         finally:
-            loop.close()
+            if owns_analyzer:
+                loop.run_until_complete(analyzer.close())
+                loop.close()
 
         if "error" in result:
             return result
@@ -126,12 +222,12 @@ def run_inference_on_media(file_path, view, model_name, user_id=None, session_id
             "view": result.get("detected_view", "unknown"),
             "model": model_name,
             "file_type": (
-                "image" if file_extension in [".jpg", ".jpeg", ".png"] else "video"
+                "image" if file_extension in INFERENCE_IMAGE_EXTENSIONS else "video"
             ),
         }
 
     except Exception as e:
-        print(f"Error during inference: {str(e)}")
+        logger.exception("Error during inference: %s", e)
         return {"error": f"Inference failed: {str(e)}", "view": view}
 
 
@@ -205,11 +301,90 @@ def run_inference_on_media(file_path, view, model_name, user_id=None, session_id
 #         }
 
 
+def analyze_session_file(
+    file_key, view, model_name, user_id, session_id, analyzer=None, loop=None
+):
+    """
+    Download a session file from MinIO and run inference on it.
+
+    Images are read straight into memory and decoded from bytes; videos are
+    written to a temporary file because OpenCV can only open them by path.
+    analyzer and loop are passed on to run_inference_on_media.
+    """
+    file_extension = os.path.splitext(file_key)[1]
+    decoded_key = unquote(file_key)
+
+    if file_extension.lower() in INFERENCE_IMAGE_EXTENSIONS:
+        logger.info("Downloading %s into memory", file_key)
+        try:
+            file_data = read_object("videos", decoded_key)
+
+            if not file_data:
+                logger.error("Failed to download file %s", file_key)
+                return {"error": f"Failed to download {file_key}", "view": view}
+
+            logger.info(
+                "Running inference on %s for session %s/%s", file_key, user_id, session_id
+            )
+            return run_inference_on_media(
+                file_key,
+                view,
+                model_name,
+                user_id,
+                session_id,
+                file_data=file_data,
+                analyzer=analyzer,
+                loop=loop,
+            )
+
+        except Exception as e:
+            logger.exception("Error processing file %s: %s", file_key, e)
+            return {"error": str(e), "view": view}
+
+    # Create unique temp file name using session and view to avoid conflicts
+    unique_prefix = f"{user_id}_{session_id}_{view}_{model_name}_"
+    with tempfile.NamedTemporaryFile(
+        suffix=file_extension, prefix=unique_prefix, delete=False
+    ) as tmp_file:
+        tmp_path = tmp_file.name
+
+    logger.info("Downloading %s to temporary file: %s", file_key, tmp_path)
+    try:
+        minio_client.fget_object("videos", decoded_key, tmp_path)
+
+        # Verify file was downloaded correctly
+        if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+            logger.error("Failed to download file %s to %s", file_key, tmp_path)
+            return {"error": f"Failed to download {file_key}", "view": view}
+
+        logger.info(
+            "Running inference on %s for session %s/%s", tmp_path, user_id, session_id
+        )
+        return run_inference_on_media(
+            tmp_path,
+            view,
+            model_name,
+            user_id,
+            session_id,
+            analyzer=analyzer,
+            loop=loop,
+        )
+
+    except Exception as e:
+        logger.exception("Error processing file %s: %s", file_key, e)
+        return {"error": str(e), "view": view}
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
 def process_session_files(user_id, session_id, model_name, app):
     """Process all files in a session folder and aggregate results"""
     with app.app_context():
         try:
-            print(f"Processing session: {user_id}/{session_id} with model {model_name}")
+            logger.info(
+                "Processing session: %s/%s with model %s", user_id, session_id, model_name
+            )
 
             # Find analysis record
             analysis = Analysis.query.filter_by(
@@ -222,13 +397,26 @@ def process_session_files(user_id, session_id, model_name, app):
             ).all()
             
             if len(all_matching_analyses) > 1:
-                print(f"WARNING: Found {len(all_matching_analyses)} analysis records for {user_id}/{session_id}")
+                logger.warning(
+                    "Found %d analysis records for %s/%s",
+                    len(all_matching_analyses),
+                    user_id,
+                    session_id,
+                )
                 for idx, record in enumerate(all_matching_analyses):
-                    print(f"  Analysis {idx+1}: ID={record.id}, Status={record.status}, Created={record.created_at}")
+                    logger.warning(
+                        "  Analysis %d: ID=%s, Status=%s, Created=%s",
+                        idx + 1,
+                        record.id,
+                        record.status,
+                        record.created_at,
+                    )
             
             if not analysis:
-                print(
-                    f"Warning: Analysis record not found for {user_id}/{session_id}, creating new one"
+                logger.warning(
+                    "Analysis record not found for %s/%s, creating new one",
+                    user_id,
+                    session_id,
                 )
                 analysis = Analysis(
                     user_id=int(user_id),
@@ -244,103 +432,112 @@ def process_session_files(user_id, session_id, model_name, app):
                     analysis.status = "in_progress"
                     db.session.commit()
 
-            print(f"Processing session {session_id} with status: {analysis.status}")
+            logger.info(
+                "Processing session %s with status: %s", session_id, analysis.status
+            )
 
             # List all files in the session folder
             folder_prefix = f"{user_id}/{session_id}/"
-            print(f"Searching for files with prefix: {folder_prefix}")
-            objects = list(
-                minio_client.list_objects(
-                    "videos", prefix=folder_prefix, recursive=True
-                )
+            logger.info("Searching for files with prefix: %s", folder_prefix)
+            objects = minio_client.list_objects(
+                "videos", prefix=folder_prefix, recursive=True
             )
 
-            if not objects:
+            # Peek at the first object so an empty session is detected
+            # without materializing the whole listing
+            first_object = next(objects, None)
+            if first_object is None:
                 analysis.status = "failed"
                 db.session.commit()
-                print(f"No files found for session {session_id}")
+                logger.warning("No files found for session %s", session_id)
                 return
 
-            print(f"Found {len(objects)} files in session:")
-            for obj in objects:
-                print(f"  - {obj.object_name}")
-
             # Process each file
             session_results = {}
+            file_count = 0
 
-            for obj in objects:
-                file_key = obj.object_name
-                filename = os.path.basename(file_key)
-                base_name = os.path.splitext(filename)[0]
+            # All files of the session share one inference connection
+            analyzer = create_service_analyzer(model_name)
+            loop = new_inference_loop() if analyzer is not None else None
+            try:
+                for obj in itertools.chain((first_object,), objects):
+                    file_count += 1
+                    file_key = obj.object_name
+                    filename = os.path.basename(file_key)
+                    base_name = os.path.splitext(filename)[0]
 
-                print(f"Processing object: {file_key}")
+                    logger.info("Processing object: %s", file_key)
                 
-                # Validate that this file actually belongs to our session
-                if not file_key.startswith(f"{user_id}/{session_id}/"):
-                    print(f"WARNING: File {file_key} does not belong to session {user_id}/{session_id}, skipping")
-                    continue
-
-                # Extract view from filename (format: model_view)
-                if "_" in base_name:
-                    file_model, view = base_name.split("_", 1)
-                    # Additional validation: ensure the model matches
-                    if file_model != model_name:
-                        print(f"WARNING: File model {file_model} does not match expected model {model_name}, skipping")
+                    # Validate that this file actually belongs to our session
+                    if not file_key.startswith(f"{user_id}/{session_id}/"):
+                        logger.warning(
+                            "File %s does not belong to session %s/%s, skipping",
+                            file_key,
+                            user_id,
+                            session_id,
+                        )
                         continue
-                else:
-                    # Skip files that don't follow the expected format
-                    print(f"Skipping file with invalid format: {filename}")
-                    continue
 
-                print(f"Processing file {filename} for view {view} with model {file_model}")
-
-                # Download and process file with unique temporary file name
-                file_extension = os.path.splitext(file_key)[1]
-                # Create unique temp file name using session and view to avoid conflicts
-                unique_prefix = f"{user_id}_{session_id}_{view}_{model_name}_"
-                with tempfile.NamedTemporaryFile(
-                    suffix=file_extension, prefix=unique_prefix, delete=False
-                ) as tmp_file:
-                    tmp_path = tmp_file.name
-
-                print(f"Downloading {file_key} to temporary file: {tmp_path}")
-                try:
-                    decoded_key = unquote(file_key)
-                    minio_client.fget_object("videos", decoded_key, tmp_path)
-                    
-                    # Verify file was downloaded correctly
-                    if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
-                        print(f"ERROR: Failed to download file {file_key} to {tmp_path}")
+                    # Extract view from filename (format: model_view)
+                    if "_" in base_name:
+                        file_model, view = base_name.split("_", 1)
+                        # Additional validation: ensure the model matches
+                        if file_model != model_name:
+                            logger.warning(
+                                "File model %s does not match expected model %s, skipping",
+                                file_model,
+                                model_name,
+                            )
+                            continue
+                    else:
+                        # Skip files that don't follow the expected format
+                        logger.warning("Skipping file with invalid format: %s", filename)
                         continue
 
+                    logger.info(
+                        "Processing file %s for view %s with model %s",
+                        filename,
+                        view,
+                        file_model,
+                    )
+
                     # Run inference with user_id and session_id for detailed data storage
-                    print(f"Running inference on {tmp_path} for session {user_id}/{session_id}")
-                    result = run_inference_on_media(
-                        tmp_path, view, model_name, user_id, session_id
+                    result = analyze_session_file(
+                        file_key,
+                        view,
+                        model_name,
+                        user_id,
+                        session_id,
+                        analyzer=analyzer,
+                        loop=loop,
                     )
 
                     if "error" not in result:
                         session_results[view] = result
-                        print(f"Successfully processed {view}")
+                        logger.info("Successfully processed %s", view)
                     else:
-                        print(f"Error processing {view}: {result['error']}")
+                        logger.error("Error processing %s: %s", view, result["error"])
+
+            finally:
+                if loop is not None:
+                    loop.run_until_complete(analyzer.close())
+                    loop.close()
 
-                except Exception as e:
-                    print(f"Error processing file {file_key}: {str(e)}")
-                finally:
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
+            logger.info("Found %d files in session %s", file_count, session_id)
 
             # Update analysis with results
             if session_results:
+                # Combine the per-view detailed files so readers fetch them at once
+                save_detailed_analysis_bundle(user_id, session_id)
+
                 feedback = generate_session_feedback(session_results)
 
                 # Save feedback to MinIO as JSON file
                 save_feedback_data(user_id, session_id, feedback)
 
-                # Generate PDF report
-                pdf_bytes = generate_pdf_report(analysis, feedback)
-                save_pdf_report(user_id, session_id, pdf_bytes)
+                # Generate PDF report straight into a spooled file and upload it
+                with spool_pdf_report(analysis, feedback) as pdf_file:
+                    save_pdf_report(user_id, session_id, pdf_file)
 
                 # Update analysis status to completed
                 analysis.status = "completed"
@@ -348,17 +545,18 @@ def process_session_files(user_id, session_id, model_name, app):
 
                 send_alert_sync(user_id, analysis)
 
-                print(f"Session analysis completed for {session_id}")
+                logger.info("Session analysis completed for %s", session_id)
             else:
                 analysis.status = "failed"
                 db.session.commit()
 
                 send_alert_sync(user_id, analysis)
-                print(f"Session analysis failed for {session_id}")
+                logger.warning("Session analysis failed for %s", session_id)
 
         except Exception as e:
-            print(f"Error processing session: {str(e)}")
-            traceback.print_exc()
+            logger.exception(
+                "Error processing session %s/%s: %s", user_id, session_id, e
+            )
             # Make sure analysis exists before trying to update it
             try:
                 if "analysis" not in locals() or analysis is None:
@@ -381,60 +579,240 @@ def process_session_files(user_id, session_id, model_name, app):
                 send_alert_sync(user_id, analysis)
                 
             except Exception as db_error:
-                print(f"Error updating analysis record: {str(db_error)}")
+                logger.error("Error updating analysis record: %s", db_error)
                 send_alert_sync(user_id, analysis)
 
 
+def _run_scheduled_session(session_key, app):
+    """Timer callback: drop the pending entry and process the session"""
+    with _pending_sessions_lock:
+        # A timer that fired while it was being replaced leaves the session
+        # to its replacement
+        if _pending_sessions.get(session_key) is not threading.current_thread():
+            return
+        del _pending_sessions[session_key]
+
+    user_id, session_id, model_name = session_key
+    process_session_files(user_id, session_id, model_name, app)
+
+
+def schedule_session_processing(user_id, session_id, model_name, app, only_if_pending=False):
+    """
+    Schedule processing of a session after SESSION_PROCESSING_DELAY seconds.
+
+    MinIO fires one webhook per uploaded file, so repeated calls for the same
+    session within the delay window reset the timer instead of starting a
+    second, racing one. With only_if_pending, nothing is scheduled unless a
+    timer is still waiting for the session.
+
+    Returns:
+        bool: True if a timer was started
+    """
+    session_key = (user_id, session_id, model_name)
+
+    with _pending_sessions_lock:
+        existing_timer = _pending_sessions.get(session_key)
+        if existing_timer is not None:
+            existing_timer.cancel()
+        elif only_if_pending:
+            return False
+
+        timer = threading.Timer(
+            SESSION_PROCESSING_DELAY,
+            _run_scheduled_session,
+            args=(session_key, app),
+        )
+        _pending_sessions[session_key] = timer
+        timer.start()
+
+    return True
+
+
+# Static instructions for session feedback; the session results are appended
+SESSION_FEEDBACK_PROMPT = (
+    "You are an expert firearms posture coach and biomechanics analyst.\n\n"
+    "Your task:\n"
+    "Analyze a user’s fighting‑stance firearm posture using pose‑estimation JSON data (COCO‑WholeBody 133 keypoints) from up to four views: front, left, right, back.\n\n"
+    "Input:\n"
+    "A JSON object that may include any combination of sides (“front”, “left”, “right”, “back”). Each side contains:\n"
+    '  - "score": metric scores relevant to that view\n'
+    '  - "measurements": actual values or "unknown"\n'
+    '  - "keypoints": raw pose‑estimation data\n\n'
+    "For each side present, you must evaluate each **metric separately**, distinguishing:\n"
+    "  - **Commendation**: what is good or optimal for that metric\n"
+    "  - **Critique**: what deviates or needs improvement for that metric\n"
+    "  - **Suggestions**: concrete, actionable steps to improve that metric\n\n"
+    "If a metric is missing or marked “unknown”, note that analysis cannot be done for that metric.\n\n"
+    "Expected output:\n"
+    "Return a JSON structured as follows:\n\n"
+    "{\n"
+    '  "<side>": {\n'
+    '    "<metric1>": {\n'
+    '      "commendation": "...",\n'
+    '      "critique": "...",\n'
+    '      "suggestions": [ "...", "..." ]\n'
+    "    },\n"
+    '    "<metric2>": { ... },\n'
+    "    ...\n"
+    "  },\n"
+    "  ...\n"
+    "}\n\n"
+    "Output the JSON object only—no additional prose outside of the JSON. Just JSON to allow json.loads() to work\n\n"
+    "Keep feedback **succinct, actionable**, and **focused per metric**.\n"
+)
+
+
 def generate_session_feedback(session_results):
     """Generate feedback based on all views in the session"""
-    client = genai.Client()
-    prompt = (
-        "You are an expert firearms posture coach and biomechanics analyst.\n\n"
-        "Your task:\n"
-        "Analyze a user’s fighting‑stance firearm posture using pose‑estimation JSON data (COCO‑WholeBody 133 keypoints) from up to four views: front, left, right, back.\n\n"
-        "Input:\n"
-        "A JSON object that may include any combination of sides (“front”, “left”, “right”, “back”). Each side contains:\n"
-        '  - "score": metric scores relevant to that view\n'
-        '  - "measurements": actual values or "unknown"\n'
-        '  - "keypoints": raw pose‑estimation data\n\n'
-        "For each side present, you must evaluate each **metric separately**, distinguishing:\n"
-        "  - **Commendation**: what is good or optimal for that metric\n"
-        "  - **Critique**: what deviates or needs improvement for that metric\n"
-        "  - **Suggestions**: concrete, actionable steps to improve that metric\n\n"
-        "If a metric is missing or marked “unknown”, note that analysis cannot be done for that metric.\n\n"
-        "Expected output:\n"
-        "Return a JSON structured as follows:\n\n"
-        "{\n"
-        '  "<side>": {\n'
-        '    "<metric1>": {\n'
-        '      "commendation": "...",\n'
-        '      "critique": "...",\n'
-        '      "suggestions": [ "...", "..." ]\n'
-        "    },\n"
-        '    "<metric2>": { ... },\n'
-        "    ...\n"
-        "  },\n"
-        "  ...\n"
-        "}\n\n"
-        "Output the JSON object only—no additional prose outside of the JSON. Just JSON to allow json.loads() to work\n\n"
-        "Keep feedback **succinct, actionable**, and **focused per metric**.\n"
-        f"{session_results}"
+    client = get_gemini_client()
+    prompt = SESSION_FEEDBACK_PROMPT + json.dumps(
+        session_results, separators=(",", ":"), default=str
     )
 
     response = client.models.generate_content(model="gemini-2.5-flash", contents=prompt)
 
     if response and response.text:
         try:
-            json_str = response.text.strip("`json")
+            match = _FENCE_RE.match(response.text)
+            json_str = match.group(1) if match else response.text.strip()
             feedback_json = json.loads(json_str)
             return feedback_json
         except json.JSONDecodeError:
-            print("Error: Unable to parse feedback as JSON.")
+            logger.error("Unable to parse feedback as JSON.")
             return {"error": "Invalid JSON response from Gemini API."}
 
     return response.text if response and response.text else "No feedback generated"
 
 
+def start_session_processing(sessions_to_process, app):
+    """
+    Mark the given (user_id, session_id, model_name) sessions as in_progress
+    and schedule them for processing. Runs on a webhook worker thread.
+    """
+    with app.app_context():
+        try:
+            # Fetch the analysis records for every session in one query
+            session_pairs = {
+                (int(user_id), session_id)
+                for user_id, session_id, _ in sessions_to_process
+            }
+            existing_analyses = {
+                (record.user_id, record.session_id): record
+                for record in Analysis.query.filter(
+                    tuple_(Analysis.user_id, Analysis.session_id).in_(session_pairs)
+                ).all()
+            }
+
+            sessions_to_schedule = []
+
+            for user_id, session_id, model_name in sessions_to_process:
+                logger.info(
+                    "Starting session processing: %s/%s with model %s",
+                    user_id,
+                    session_id,
+                    model_name,
+                )
+
+                # Check if session is already being processed
+                existing_analysis = existing_analyses.get((int(user_id), session_id))
+
+                if not existing_analysis:
+                    logger.warning(
+                        "No existing analysis found for %s/%s, cannot start processing",
+                        user_id,
+                        session_id,
+                    )
+                    continue
+
+                logger.info(
+                    "Found existing analysis: id=%s, status=%s",
+                    existing_analysis.id,
+                    existing_analysis.status,
+                )
+
+                # upload_media schedules the session itself once every view
+                # of the request has been stored
+                if existing_analysis.status == "uploading":
+                    logger.info(
+                        "Session %s is still uploading, skipping", session_id
+                    )
+                    continue
+
+                # A later upload for a session still waiting out its delay
+                # restarts the wait so the other views can arrive
+                if existing_analysis.status == "in_progress" and schedule_session_processing(
+                    user_id, session_id, model_name, app, only_if_pending=True
+                ):
+                    logger.info(
+                        "Session %s is still waiting for uploads, delay restarted",
+                        session_id,
+                    )
+                    continue
+
+                if existing_analysis.status in ["in_progress", "completed"]:
+                    logger.info(
+                        "Session %s is already being processed or completed, skipping",
+                        session_id,
+                    )
+                    continue
+
+                # Update status to in_progress to prevent duplicate processing
+                existing_analysis.status = "in_progress"
+                existing_analysis.model_name = model_name
+                sessions_to_schedule.append((user_id, session_id, model_name))
+                logger.info(
+                    "Updated existing analysis %s status to in_progress",
+                    existing_analysis.id,
+                )
+
+            if not sessions_to_schedule:
+                return
+
+            # Persist all status updates with a single commit
+            db.session.commit()
+
+            for user_id, session_id, model_name in sessions_to_schedule:
+                logger.info(
+                    "Marked session %s as in_progress, scheduling processing",
+                    session_id,
+                )
+
+                # Add a small delay to allow all files to be uploaded
+                schedule_session_processing(user_id, session_id, model_name, app)
+
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Error starting session processing: %s", e)
+
+
+def _webhook_worker(app):
+    """Pop webhook jobs off the queue and start processing their sessions"""
+    while True:
+        sessions_to_process = _webhook_jobs.get()
+        try:
+            start_session_processing(sessions_to_process, app)
+        finally:
+            _webhook_jobs.task_done()
+
+
+def _ensure_webhook_workers(app):
+    """Start the webhook worker threads on first use"""
+    global _webhook_workers_started
+
+    with _webhook_workers_lock:
+        if _webhook_workers_started:
+            return
+
+        for index in range(WEBHOOK_WORKERS):
+            threading.Thread(
+                target=_webhook_worker,
+                args=(app,),
+                name=f"minio-webhook-{index}",
+                daemon=True,
+            ).start()
+        _webhook_workers_started = True
+
+
 @minio_hook_bp.route("/webhook", methods=["POST"])
 def minio_webhook():
     """Handle MinIO webhook notifications for media uploads"""
@@ -458,50 +836,16 @@ def minio_webhook():
             session_key = (user_id, session_id, model_name)
             sessions_to_process.add(session_key)
 
-        # Process each unique session
-        for user_id, session_id, model_name in sessions_to_process:
-            print(
-                f"Starting session processing: {user_id}/{session_id} with model {model_name}"
-            )
-
-            # Check if session is already being processed
-            existing_analysis = Analysis.query.filter_by(
-                user_id=user_id, session_id=session_id
-            ).first()
-            
-            if existing_analysis:
-                print(f"Found existing analysis: id={existing_analysis.id}, status={existing_analysis.status}")
-            else:
-                print(f"No existing analysis found for user_id={int(user_id)}, session_id={session_id}")
-
-            if existing_analysis and existing_analysis.status in ["in_progress", "completed"]:
-                print(f"Session {session_id} is already being processed or completed, skipping")
-                continue
-
-            # Update status to in_progress to prevent duplicate processing
-            if existing_analysis:
-                existing_analysis.status = "in_progress"
-                existing_analysis.model_name = model_name
-                db.session.commit()
-                print(f"Updated existing analysis {existing_analysis.id} status to in_progress")
-            else:
-                return jsonify(
-                    {
-                        "error": f"No existing analysis found for {user_id}/{session_id}, cannot start processing"
-                    }
-                ), 400
-
-            print(f"Marked session {session_id} as in_progress, scheduling processing")
-
-            # Capture the app object before starting the timer
-            app = current_app._get_current_object()
-
-            # Add a small delay to allow all files to be uploaded
-            threading.Timer(
-                2.0,  # 2 second delay
-                process_session_files,
-                args=(user_id, session_id, model_name, app),
-            ).start()
+        if sessions_to_process:
+            # Hand the sessions to the worker pool and acknowledge immediately
+            _ensure_webhook_workers(current_app._get_current_object())
+            try:
+                _webhook_jobs.put_nowait(tuple(sessions_to_process))
+            except queue.Full:
+                logger.error(
+                    "Webhook queue full, dropping %d sessions", len(sessions_to_process)
+                )
+                return jsonify({"error": "Webhook queue is full, retry later"}), 503
 
         return (
             jsonify(
@@ -514,6 +858,5 @@ def minio_webhook():
         )
 
     except Exception as e:
-        print(f"ERROR in webhook handler: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error in webhook handler: %s", e)
         return jsonify({"error": str(e)}), 500
@@ -1,30 +1,64 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.targets import ValueTarget
 from src.services.minio import client as minio_client
+from src.services.minio import ensure_bucket as ensure_minio_bucket
+from src.services.minio import io_executor, iter_delete_objects
+from src.services.streaming_upload import (
+    DEFER_UPLOAD,
+    UPLOAD_PART_SIZE,
+    MinioUploadTarget,
+    UnexpectedPartTarget,
+    UploadRejected,
+)
+from src.controllers.minio_video_controller import schedule_session_processing
 from src.config.database import db
+from src.utils.cache import invalidate_session_urls
 from src.models.analysis import Analysis
+import logging
 import os
+from concurrent.futures import wait
+
+logger = logging.getLogger(__name__)
 
 video_bp = Blueprint("video", __name__)
 
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
 BUCKET_NAME = "videos"
 
+# Public URL prefix of uploaded objects, e.g. http://minio:9000/videos/
+FILE_URL_PREFIX = f"http://{MINIO_ENDPOINT}/{BUCKET_NAME}/"
 
-def ensure_bucket():
-    if not minio_client.bucket_exists(BUCKET_NAME):
-        minio_client.make_bucket(BUCKET_NAME)
+ALLOWED_VIDEO_EXTENSIONS = frozenset(
+    {".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm", ".m4v"}
+)
+ALLOWED_IMAGE_EXTENSIONS = frozenset(
+    {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif", ".webp"}
+)
+ALLOWED_EXTENSIONS = ALLOWED_VIDEO_EXTENSIONS | ALLOWED_IMAGE_EXTENSIONS
 
+AVAILABLE_MODELS = frozenset({"cx", "gy"})
+
+# Supported views (user must specify the actual view)
+SUPPORTED_VIEWS = ("front", "left", "right", "back")
+
+# Size of each read from the request body while parsing multipart uploads
+UPLOAD_READ_CHUNK_SIZE = 64 * 1024
 
-@video_bp.route("/upload", methods=["POST"])
-@jwt_required()
-def upload_media():
-    """Upload 1-4 media files for posture analysis (supports front, left, right, back views)"""
-    user_id = str(get_jwt_identity())
 
-    # Get required session_id
-    session_id = request.form.get("session_id")
+def get_file_extension(filename):
+    """Return the lower-cased extension of filename including the dot, or ''"""
+    dot = filename.rfind(".")
+    return filename[dot:].lower() if dot >= 0 else ""
+
+
+def ensure_bucket():
+    ensure_minio_bucket(BUCKET_NAME)
+
+
+def validate_upload_request(user_id, session_id, model_id):
+    """Validate the upload form fields, returning an error response or None"""
     if not session_id:
         return jsonify({"error": "session_id is required"}), 400
 
@@ -46,132 +80,249 @@ def upload_media():
             409,
         )  # Conflict status code
 
-    # Get optional model parameter (defaults to 'cx')
-    model_id = request.form.get("model")
     if not model_id:
         return jsonify({"error": "model is required"}), 400
 
     # Validate model
-    available_models = ["cx", "gy"]
-    if model_id not in available_models:
+    if model_id not in AVAILABLE_MODELS:
         return (
             jsonify(
                 {
-                    "error": f"Invalid model: {model_id}. Available models: {available_models}"
+                    "error": f"Invalid model: {model_id}. Available models: {sorted(AVAILABLE_MODELS)}"
                 }
             ),
             400,
         )
 
-    # Validate file types
-    allowed_extensions = {
-        ".mp4",
-        ".avi",
-        ".mov",
-        ".mkv",
-        ".wmv",
-        ".flv",
-        ".webm",
-        ".m4v",
-        ".jpg",
-        ".jpeg",
-        ".png",
-        ".bmp",
-        ".tiff",
-        ".tif",
-        ".webp",
-    }
-
-    # Supported views (user must specify the actual view)
-    supported_views = ["front", "left", "right", "back"]
+    return None
 
-    uploaded_files = {}
-    errors = []
-
-    # Check if any files are provided
-    if not request.files:
-        return jsonify({"error": "No files provided"}), 400
 
-    # Create analysis record in database BEFORE uploading files to prevent race condition
+def create_analysis_record(user_id, session_id, model_id, status="pending"):
+    """Create the analysis record, returning (analysis, error_response)"""
     try:
         new_analysis = Analysis(
             user_id=int(user_id),  # Convert to int since Analysis model expects integer
             session_id=session_id,
             model_name=model_id,
-            status="pending",  # Initial status before processing starts
+            status=status,  # Initial status before processing starts
         )
         db.session.add(new_analysis)
         db.session.commit()
-        
-        analysis_id = new_analysis.id
-        print(f"Created analysis record with ID: {analysis_id}")
-        
+
+        logger.info("Created analysis record with ID: %s", new_analysis.id)
+        return new_analysis, None
+
     except Exception as e:
         db.session.rollback()
-        print(f"Error creating analysis record: {str(e)}")
-        return jsonify({"error": f"Failed to create analysis record: {str(e)}"}), 500
+        logger.error("Error creating analysis record: %s", e)
+        return None, (
+            jsonify({"error": f"Failed to create analysis record: {str(e)}"}),
+            500,
+        )
 
-    # Process each file in the request
-    for field_name, file in request.files.items():
-        if file.filename == "":
-            errors.append(f"No file selected for {field_name}")
-            continue
 
-        # Determine view from field name
-        view = field_name.lower()
-        if view not in supported_views:
-            errors.append(
-                f"Unsupported view: {view}. Supported views: {supported_views}"
-            )
-            continue
+def delete_analysis_record(analysis):
+    """Remove an analysis record whose files could not be uploaded"""
+    try:
+        db.session.delete(analysis)
+        db.session.commit()
+    except Exception as cleanup_error:
+        db.session.rollback()
+        logger.error("Error cleaning up analysis record: %s", cleanup_error)
 
-        # Validate file type
-        file_ext = os.path.splitext(file.filename.lower())[1]
-        if file_ext not in allowed_extensions:
-            errors.append(f"Unsupported file type for {view}: {file_ext}")
-            continue
 
-        # Create MinIO path: user_id/session_id/modelname_view.ext
-        minio_path = f"{user_id}/{session_id}/{model_id}_{view}{file_ext}"
-
-        try:
-            ensure_bucket()
-            file.seek(0)
-            minio_client.put_object(
-                BUCKET_NAME,
-                minio_path,
-                file,
-                length=-1,
-                part_size=10 * 1024 * 1024,
-                content_type=file.mimetype,
-            )
+@video_bp.route("/upload", methods=["POST"])
+@jwt_required()
+def upload_media():
+    """
+    Upload 1-4 media files for posture analysis (supports front, left, right, back views)
 
-            uploaded_files[view] = {
-                "file_url": f"http://{MINIO_ENDPOINT}/{BUCKET_NAME}/{minio_path}",
-                "filename": f"{model_id}_{view}{file_ext}",
-                "original_filename": file.filename,
-                "model": model_id,
-                "view": view,
-                "file_type": (
-                    "video"
-                    if file_ext
-                    in {".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm", ".m4v"}
-                    else "image"
+    The multipart body is parsed incrementally and each file is streamed
+    straight into MinIO as it arrives. Send session_id and model before the
+    files; file parts that arrive first are spooled until they are known.
+    """
+    user_id = str(get_jwt_identity())
+
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+    except Exception:
+        return jsonify({"error": "Request must be multipart/form-data"}), 400
+
+    session_target = ValueTarget()
+    model_target = ValueTarget()
+    parser.register("session_id", session_target)
+    parser.register("model", model_target)
+
+    errors = []
+    file_exts = {}
+
+    # The analysis record once created, or the error response that ends the
+    # request, shared by the per-file callbacks below
+    state = {"analysis": None, "response": None}
+
+    def form_fields():
+        session_id = session_target.value.decode("utf-8") or None
+        model_id = model_target.value.decode("utf-8") or None
+        return session_id, model_id
+
+    def prepare_session():
+        """Validate the form fields and create the analysis record once"""
+        if state["analysis"] is None and state["response"] is None:
+            session_id, model_id = form_fields()
+            state["response"] = validate_upload_request(user_id, session_id, model_id)
+            if state["response"] is None:
+                # Create analysis record in database BEFORE uploading files to
+                # prevent race condition. Each view's webhook fires as soon as
+                # it is stored, so the session is held as uploading until the
+                # whole body has been read
+                state["analysis"], state["response"] = create_analysis_record(
+                    user_id, session_id, model_id, status="uploading"
+                )
+        return state["analysis"] is not None
+
+    def object_name_resolver(view):
+        def resolve(filename):
+            if not filename:
+                errors.append(f"No file selected for {view}")
+                raise UploadRejected(view)
+
+            file_ext = get_file_extension(filename)
+            if file_ext not in ALLOWED_EXTENSIONS:
+                errors.append(f"Unsupported file type for {view}: {file_ext}")
+                raise UploadRejected(view)
+            file_exts[view] = file_ext
+
+            session_id, model_id = form_fields()
+            if not session_id or not model_id:
+                return DEFER_UPLOAD
+
+            if not prepare_session():
+                raise UploadRejected(view)
+
+            # Create MinIO path: user_id/session_id/modelname_view.ext
+            return f"{user_id}/{session_id}/{model_id}_{view}{file_ext}"
+
+        return resolve
+
+    # Bodies smaller than one MinIO part are buffered and sent in one PUT each
+    content_length = request.content_length
+    buffered = bool(content_length) and content_length < UPLOAD_PART_SIZE
+
+    def view_matcher(view):
+        return lambda _, part_name: part_name.lower() == view
+
+    targets = {}
+    for view in SUPPORTED_VIEWS:
+        targets[view] = MinioUploadTarget(
+            BUCKET_NAME, object_name_resolver(view), buffered=buffered
+        )
+        # Part names are matched case-insensitively, e.g. Front for front
+        parser.register(view, targets[view], view_matcher(view))
+
+    def reject_unsupported_view(part_name):
+        errors.append(
+            f"Unsupported view: {part_name.lower()}. Supported views: {list(SUPPORTED_VIEWS)}"
+        )
+
+    unexpected_target = UnexpectedPartTarget(reject_unsupported_view)
+    parser.register("*", unexpected_target, unexpected_target.matches)
+
+    def abort_uploads():
+        for target in targets.values():
+            was_uploaded = target.finished and target.uploaded
+            target.abort()
+            if was_uploaded:
+                try:
+                    minio_client.remove_object(BUCKET_NAME, target.object_name)
+                except Exception as e:
+                    logger.error(
+                        "Error removing %s: %s", target.object_name, e
+                    )
+        if state["analysis"] is not None:
+            delete_analysis_record(state["analysis"])
+
+    try:
+        while True:
+            chunk = request.stream.read(UPLOAD_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.data_received(chunk)
+
+            # Stop reading as soon as a request-level check has failed
+            if state["response"] is not None:
+                break
+    except Exception as e:
+        abort_uploads()
+        return jsonify({"error": f"Failed to read upload: {str(e)}"}), 400
+
+    if state["response"] is not None:
+        abort_uploads()
+        return state["response"]
+
+    # Fail any part the body ended in the middle of
+    for target in targets.values():
+        if target.received and not target.finished:
+            target.abort()
+
+    received_targets = {
+        view: target for view, target in targets.items() if target.received
+    }
+
+    # Check if any files are provided
+    if not received_targets or not prepare_session():
+        abort_uploads()
+        if state["response"] is not None:
+            return state["response"]
+        if errors:
+            return (
+                jsonify(
+                    {"error": "No files were uploaded successfully", "details": errors}
                 ),
-            }
+                400,
+            )
+        return jsonify({"error": "No files provided"}), 400
+
+    session_id, model_id = form_fields()
+    analysis_id = state["analysis"].id
+
+    # Upload the parts that arrived before session_id and model in parallel
+    deferred_targets = {
+        view: target for view, target in received_targets.items() if target.deferred
+    }
+    if deferred_targets:
+        wait(
+            [
+                io_executor.submit(
+                    target.upload_deferred,
+                    f"{user_id}/{session_id}/{model_id}_{view}{file_exts[view]}",
+                )
+                for view, target in deferred_targets.items()
+            ]
+        )
+
+    uploaded_files = {}
+    for view, target in received_targets.items():
+        if target.rejected:
+            continue
+        if not target.uploaded:
+            errors.append(f"Failed to upload {view}: {target.error}")
+            continue
 
-        except Exception as e:
-            errors.append(f"Failed to upload {view}: {str(e)}")
+        file_ext = file_exts[view]
+        uploaded_files[view] = {
+            "file_url": FILE_URL_PREFIX + target.object_name,
+            "filename": f"{model_id}_{view}{file_ext}",
+            "original_filename": target.multipart_filename,
+            "model": model_id,
+            "view": view,
+            "file_type": "video" if file_ext in ALLOWED_VIDEO_EXTENSIONS else "image",
+        }
 
     # Validate that at least one file was uploaded successfully
     if not uploaded_files:
         # If no files were uploaded successfully, delete the analysis record
-        try:
-            db.session.delete(new_analysis)
-            db.session.commit()
-        except Exception as cleanup_error:
-            print(f"Error cleaning up analysis record: {str(cleanup_error)}")
-        
+        delete_analysis_record(state["analysis"])
+
         return (
             jsonify(
                 {"error": "No files were uploaded successfully", "details": errors}
@@ -179,6 +330,23 @@ def upload_media():
             400,
         )
 
+    # Every view is stored now; release the session for processing, which
+    # its webhooks skipped while it was uploading
+    try:
+        state["analysis"].status = "pending"
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Error releasing session %s for processing: %s", session_id, e)
+        return jsonify({"error": f"Failed to start analysis: {str(e)}"}), 500
+
+    schedule_session_processing(
+        user_id, session_id, model_id, current_app._get_current_object()
+    )
+
+    # Presigned URLs cached for an earlier session with this id are stale
+    invalidate_session_urls(BUCKET_NAME, f"{user_id}/{session_id}/")
+
     # Return results
     if errors:
         return (
@@ -211,6 +379,95 @@ def upload_media():
         )
 
 
+@video_bp.route("/upload/stream", methods=["POST"])
+@jwt_required()
+def upload_media_stream():
+    """
+    Upload a single media file sent as the raw request body
+
+    The file metadata is read from the X-Session-Id, X-Model, X-View and
+    X-Filename headers, and the body is passed to MinIO with its exact
+    Content-Length so it is streamed without any spooling.
+    """
+    user_id = str(get_jwt_identity())
+
+    session_id = request.headers.get("X-Session-Id")
+    model_id = request.headers.get("X-Model")
+    view = request.headers.get("X-View")
+    filename = request.headers.get("X-Filename")
+    content_length = request.content_length
+
+    if view not in SUPPORTED_VIEWS:
+        return (
+            jsonify(
+                {"error": f"Invalid view: {view}. Supported views: {list(SUPPORTED_VIEWS)}"}
+            ),
+            400,
+        )
+
+    if not filename:
+        return jsonify({"error": "X-Filename header is required"}), 400
+
+    file_ext = get_file_extension(filename)
+    if file_ext not in ALLOWED_EXTENSIONS:
+        return jsonify({"error": f"Unsupported file type for {view}: {file_ext}"}), 400
+
+    if not content_length:
+        return jsonify({"error": "Content-Length header is required"}), 411
+
+    error_response = validate_upload_request(user_id, session_id, model_id)
+    if error_response is not None:
+        return error_response
+
+    analysis, error_response = create_analysis_record(user_id, session_id, model_id)
+    if error_response is not None:
+        return error_response
+
+    # Create MinIO path: user_id/session_id/modelname_view.ext
+    minio_path = f"{user_id}/{session_id}/{model_id}_{view}{file_ext}"
+
+    try:
+        minio_client.put_object(
+            BUCKET_NAME,
+            minio_path,
+            request.stream,
+            length=content_length,
+            part_size=UPLOAD_PART_SIZE,
+            content_type=request.content_type or "application/octet-stream",
+        )
+    except Exception as e:
+        delete_analysis_record(analysis)
+        return jsonify({"error": f"Failed to upload {view}: {str(e)}"}), 500
+
+    # Presigned URLs cached for an earlier session with this id are stale
+    invalidate_session_urls(BUCKET_NAME, f"{user_id}/{session_id}/")
+
+    uploaded_files = {
+        view: {
+            "file_url": FILE_URL_PREFIX + minio_path,
+            "filename": f"{model_id}_{view}{file_ext}",
+            "original_filename": filename,
+            "model": model_id,
+            "view": view,
+            "file_type": "video" if file_ext in ALLOWED_VIDEO_EXTENSIONS else "image",
+        }
+    }
+
+    return (
+        jsonify(
+            {
+                "message": "All files uploaded successfully. 1 files uploaded. Analysis will begin automatically.",
+                "uploaded_files": uploaded_files,
+                "session_id": session_id,
+                "model": model_id,
+                "analysis_id": analysis.id,
+                "views_uploaded": [view],
+            }
+        ),
+        201,
+    )
+
+
 @video_bp.route("/delete", methods=["POST"])
 @jwt_required()
 def delete_session():
@@ -230,22 +487,30 @@ def delete_session():
         objects = minio_client.list_objects(
             BUCKET_NAME, prefix=folder_prefix, recursive=True
         )
-        object_names = [obj.object_name for obj in objects]
-
-        if not object_names:
-            return jsonify({"message": "No files found to delete"}), 404
 
-        # Delete all files in the session
+        # Delete files as they are listed, in batched DeleteObjects requests
         deleted_files = []
-        for minio_path in object_names:
-            try:
-                minio_client.remove_object(BUCKET_NAME, minio_path)
-                deleted_files.append(minio_path)
-            except Exception as e:
-                return (
-                    jsonify({"error": f"Failed to delete {minio_path}: {str(e)}"}),
-                    500,
-                )
+        delete_errors = list(
+            minio_client.remove_objects(
+                BUCKET_NAME, iter_delete_objects(objects, deleted_files.append)
+            )
+        )
+        invalidate_session_urls(BUCKET_NAME, folder_prefix)
+        if delete_errors:
+            return (
+                jsonify(
+                    {
+                        "error": "Failed to delete "
+                        + "; ".join(
+                            f"{error.name}: {error.message}" for error in delete_errors
+                        )
+                    }
+                ),
+                500,
+            )
+
+        if not deleted_files:
+            return jsonify({"message": "No files found to delete"}), 404
 
         return (
             jsonify(
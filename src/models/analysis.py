@@ -1,28 +1,30 @@
-from datetime import datetime
-import pytz
 from src.config.database import db, db_config
 
-# Singapore timezone
-SGT = pytz.timezone('Asia/Singapore')
-
-def get_sgt_now():
-    """Get current time in Singapore timezone"""
-    return datetime.now(SGT)
-
 class Analysis(db.Model):
     """Analysis model for storing analysis results"""
     __tablename__ = 'analysis'
     __table_args__ = (
         db.UniqueConstraint('user_id', 'session_id', name='unique_user_session'),
+        # Serves the per-user listings ordered by created_at (scanned backwards for DESC)
+        db.Index('ix_analysis_user_id_created_at', 'user_id', 'created_at'),
         {'schema': db_config.schema_name}
     )
+    # Fetch server-generated defaults such as created_at in the INSERT itself
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey(f'{db_config.schema_name}.users.id'), nullable=False)
     session_id = db.Column(db.Text, nullable=False)
     model_name = db.Column(db.String(100), nullable=False)
     status = db.Column(db.String(50), default='in_progress')  # e.g., 'in_progress', 'completed', 'failed'
-    created_at = db.Column(db.DateTime, default=get_sgt_now)
+    # Singapore wall-clock time, generated by the database. The SQL default
+    # is sent in every INSERT so rows get a timestamp on databases whose
+    # column predates the server default
+    created_at = db.Column(
+        db.DateTime,
+        default=db.func.timezone('Asia/Singapore', db.func.now()),
+        server_default=db.func.timezone('Asia/Singapore', db.func.now()),
+    )
     
     def __repr__(self):
         return f'<Analysis {self.id}>'
@@ -1,20 +1,13 @@
-from datetime import datetime
-import pytz
 from src.config.database import db, db_config
 
-# Singapore timezone
-SGT = pytz.timezone('Asia/Singapore')
-
-def get_sgt_now():
-    """Get current time in Singapore timezone"""
-    return datetime.now(SGT)
-
 
 class User(db.Model):
     """User model for authentication and user management"""
 
     __tablename__ = "users"
     __table_args__ = {"schema": db_config.schema_name}
+    # Fetch server-generated defaults such as created_at in the INSERT itself
+    __mapper_args__ = {"eager_defaults": True}
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False)
@@ -23,7 +16,14 @@ class User(db.Model):
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
     telegram_id = db.Column(db.Integer, unique=True, nullable=True)
     tele_link_expires_at = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=get_sgt_now)
+    # Singapore wall-clock time, generated by the database. The SQL default
+    # is sent in every INSERT so rows get a timestamp on databases whose
+    # column predates the server default
+    created_at = db.Column(
+        db.DateTime,
+        default=db.func.timezone("Asia/Singapore", db.func.now()),
+        server_default=db.func.timezone("Asia/Singapore", db.func.now()),
+    )
 
     # Relationship to analyses
     analyses = db.relationship(
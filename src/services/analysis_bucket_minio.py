@@ -1,22 +1,125 @@
 from datetime import timedelta
-import json
+import logging
 import os
 import io
-from typing import Dict, Any, List
+import gzip
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, BinaryIO, Union
+import orjson
 from minio.error import S3Error
 from src.services.minio import client as minio_client
+from src.services.minio import ensure_bucket, io_executor, iter_delete_objects
+from src.services.minio import read_object, retry_transient, stat_object
+from src.utils.cache import (
+    cache_presigned_url,
+    get_cached_presigned_url,
+    invalidate_presigned_url,
+)
+
+logger = logging.getLogger(__name__)
 
 ANALYSIS_BUCKET = "analysis-data"
 
+# All detailed_{side}.json files of a session combined, so they load in one GET
+DETAILED_BUNDLE_FILENAME = "detailed.json"
+
+# Sides a session can have a detailed_{side}.json file for
+DETAILED_SIDES = ("front", "left", "right", "back")
+
+# Indent stored JSON for easier debugging; compact by default
+PRETTY_ANALYSIS_JSON = os.getenv("PRETTY_ANALYSIS_JSON", "false").lower() == "true"
+
+ANALYSIS_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+if PRETTY_ANALYSIS_JSON:
+    ANALYSIS_JSON_OPTIONS |= orjson.OPT_INDENT_2
+
+# Stored JSON is gzip-compressed at the fastest level; the payloads are
+# highly repetitive, so even level 1 shrinks them several times over
+JSON_COMPRESS_LEVEL = 1
+_GZIP_MAGIC = b"\x1f\x8b"
+
+# Reports below this size go up in a single PUT; larger ones are sent as
+# parts of this size, which minio-py uploads in parallel
+PDF_PART_SIZE = 16 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class SessionPaths:
+    """Object names of one session's files in the analysis bucket"""
+
+    user_id: str
+    session_id: str
+    prefix: str = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "prefix", f"{self.user_id}/{self.session_id}/")
+
+    @property
+    def report_filename(self) -> str:
+        return f"{self.session_id}_report.pdf"
+
+    def detailed(self, side: str) -> str:
+        return f"{self.prefix}detailed_{side}.json"
+
+    def detailed_bundle(self) -> str:
+        return self.prefix + DETAILED_BUNDLE_FILENAME
+
+    def feedback(self) -> str:
+        return self.prefix + "feedback.json"
+
+    def pdf_report(self) -> str:
+        return self.prefix + self.report_filename
+
+
+@retry_transient
+def put_json_object(bucket: str, file_path: str, data: Any) -> None:
+    """
+    Serialize data to gzip-compressed JSON and upload it to MinIO
+
+    The object keeps its .json name and application/json type. It is stored
+    with Content-Encoding: gzip so presigned-URL downloads are decompressed
+    by the client transparently.
+
+    Args:
+        bucket: Bucket name
+        file_path: Object name
+        data: JSON-serializable data
+    """
+    json_bytes = gzip.compress(
+        orjson.dumps(data, default=str, option=ANALYSIS_JSON_OPTIONS),
+        compresslevel=JSON_COMPRESS_LEVEL,
+    )
+    # BytesIO over a bytes object shares its buffer instead of copying it
+    minio_client.put_object(
+        bucket,
+        file_path,
+        io.BytesIO(json_bytes),
+        length=len(json_bytes),
+        content_type="application/json",
+        metadata={"Content-Encoding": "gzip"},
+    )
+
+
+def load_json_object(data: bytes) -> Any:
+    """
+    Parse a stored JSON object, decompressing it if it is still gzipped
+
+    Bodies read through the MinIO client arrive already decompressed,
+    because urllib3 decodes Content-Encoding: gzip. Only bytes that bypass
+    that decoding still start with the gzip magic number.
+    """
+    if data[:2] == _GZIP_MAGIC:
+        data = gzip.decompress(data)
+    return orjson.loads(data)
+
 
 def ensure_analysis_bucket():
     """Ensure the analysis-data bucket exists"""
     try:
-        if not minio_client.bucket_exists(ANALYSIS_BUCKET):
-            minio_client.make_bucket(ANALYSIS_BUCKET)
-            print(f"Created bucket: {ANALYSIS_BUCKET}")
+        if ensure_bucket(ANALYSIS_BUCKET):
+            logger.info("Created bucket: %s", ANALYSIS_BUCKET)
     except S3Error as e:
-        print(f"Error ensuring analysis bucket: {e}")
+        logger.error("Error ensuring analysis bucket: %s", e)
         raise
 
 
@@ -39,26 +142,16 @@ def save_detailed_analysis_data(
         ensure_analysis_bucket()
 
         # Create file path: user_id/session_id/detailed_{detected_side}.json
-        file_path = f"{user_id}/{session_id}/detailed_{detected_side}.json"
-
-        # Convert analysis data to JSON
-        json_data = json.dumps(analysis_data, indent=2, default=str)
-        json_bytes = json_data.encode("utf-8")
+        file_path = SessionPaths(user_id, session_id).detailed(detected_side)
 
-        # Upload to MinIO
-        minio_client.put_object(
-            ANALYSIS_BUCKET,
-            file_path,
-            io.BytesIO(json_bytes),
-            len(json_bytes),
-            content_type="application/json",
-        )
+        # Convert analysis data to JSON and upload to MinIO
+        put_json_object(ANALYSIS_BUCKET, file_path, analysis_data)
 
-        print(f"Successfully saved detailed analysis data to {file_path}")
+        logger.info("Saved detailed analysis data to %s", file_path)
         return True
 
     except Exception as e:
-        print(f"Error saving detailed analysis data: {str(e)}")
+        logger.error("Error saving detailed analysis data: %s", e)
         return False
 
 
@@ -76,7 +169,7 @@ def list_analysis_files(user_id: str, session_id: str) -> List[str]:
     try:
         ensure_analysis_bucket()
 
-        prefix = f"{user_id}/{session_id}/"
+        prefix = SessionPaths(user_id, session_id).prefix
         objects = minio_client.list_objects(
             ANALYSIS_BUCKET, prefix=prefix, recursive=True
         )
@@ -84,7 +177,7 @@ def list_analysis_files(user_id: str, session_id: str) -> List[str]:
         return [obj.object_name for obj in objects]
 
     except Exception as e:
-        print(f"Error listing analysis files: {str(e)}")
+        logger.error("Error listing analysis files: %s", e)
         return []
 
 
@@ -102,19 +195,36 @@ def delete_session_analysis_data(user_id: str, session_id: str) -> bool:
     try:
         ensure_analysis_bucket()
 
-        prefix = f"{user_id}/{session_id}/"
+        prefix = SessionPaths(user_id, session_id).prefix
         objects = minio_client.list_objects(
             ANALYSIS_BUCKET, prefix=prefix, recursive=True
         )
 
-        for obj in objects:
-            minio_client.remove_object(ANALYSIS_BUCKET, obj.object_name)
+        deleted_count = 0
+
+        def count_deleted(_object_name):
+            nonlocal deleted_count
+            deleted_count += 1
+
+        delete_errors = list(
+            minio_client.remove_objects(
+                ANALYSIS_BUCKET, iter_delete_objects(objects, count_deleted)
+            )
+        )
+        for error in delete_errors:
+            logger.error("Error deleting %s: %s", error.name, error.message)
+        if delete_errors:
+            return False
+
+        invalidate_presigned_url(ANALYSIS_BUCKET, SessionPaths(user_id, session_id).pdf_report())
 
-        print(f"Deleted all analysis data for session {session_id}")
+        logger.info(
+            "Deleted %d analysis files for session %s", deleted_count, session_id
+        )
         return True
 
     except Exception as e:
-        print(f"Error deleting session analysis data: {str(e)}")
+        logger.error("Error deleting session analysis data: %s", e)
         return False
 
 
@@ -137,37 +247,43 @@ def save_feedback_data(
         ensure_analysis_bucket()
 
         # Create file path: user_id/session_id/feedback.json
-        file_path = f"{user_id}/{session_id}/feedback.json"
-
-        # Convert feedback data to JSON
-        json_data = json.dumps(feedback_data, indent=2, default=str)
-        json_bytes = json_data.encode("utf-8")
+        file_path = SessionPaths(user_id, session_id).feedback()
 
-        # Upload to MinIO
-        minio_client.put_object(
-            ANALYSIS_BUCKET,
-            file_path,
-            io.BytesIO(json_bytes),
-            length=len(json_bytes),
-            content_type="application/json",
-        )
+        # Convert feedback data to JSON and upload to MinIO
+        put_json_object(ANALYSIS_BUCKET, file_path, feedback_data)
 
-        print(f"Saved feedback data to {file_path}")
+        logger.info("Saved feedback data to %s", file_path)
         return True
 
     except Exception as e:
-        print(f"Error saving feedback data: {str(e)}")
+        logger.error("Error saving feedback data: %s", e)
         return False
 
 
-def save_pdf_report(user_id: str, session_id: str, pdf_content: bytes) -> bool:
+@retry_transient
+def _put_pdf_object(file_path: str, pdf_stream: BinaryIO, length: int) -> None:
+    """Upload a PDF stream, rewinding it so a retried attempt sends it whole"""
+    pdf_stream.seek(0)
+    minio_client.put_object(
+        ANALYSIS_BUCKET,
+        file_path,
+        pdf_stream,
+        length=length,
+        part_size=PDF_PART_SIZE,
+        content_type="application/pdf",
+    )
+
+
+def save_pdf_report(
+    user_id: str, session_id: str, pdf_content: Union[bytes, BinaryIO]
+) -> bool:
     """
     Save PDF report to MinIO
 
     Args:
         user_id: User identifier
         session_id: Session identifier
-        pdf_content: PDF content as bytes
+        pdf_content: PDF content as bytes, or a seekable file it was written to
 
     Returns:
         bool: True if successful, False otherwise
@@ -176,22 +292,24 @@ def save_pdf_report(user_id: str, session_id: str, pdf_content: bytes) -> bool:
         ensure_analysis_bucket()
 
         # Create file path: user_id/session_id/report.pdf
-        file_path = f"{user_id}/{session_id}/{session_id}_report.pdf"
+        file_path = SessionPaths(user_id, session_id).pdf_report()
+
+        if isinstance(pdf_content, (bytes, bytearray)):
+            pdf_stream = io.BytesIO(pdf_content)
+            length = len(pdf_content)
+        else:
+            pdf_stream = pdf_content
+            length = pdf_stream.seek(0, os.SEEK_END)
+            pdf_stream.seek(0)
 
         # Upload to MinIO
-        minio_client.put_object(
-            ANALYSIS_BUCKET,
-            file_path,
-            io.BytesIO(pdf_content),
-            length=len(pdf_content),
-            content_type="application/pdf",
-        )
+        _put_pdf_object(file_path, pdf_stream, length)
 
-        print(f"Saved PDF report to {file_path}")
+        logger.info("Saved PDF report to %s", file_path)
         return True
 
     except Exception as e:
-        print(f"Error saving PDF report: {str(e)}")
+        logger.error("Error saving PDF report: %s", e)
         return False
 
 
@@ -209,18 +327,13 @@ def get_feedback_data(user_id: str, session_id: str) -> Dict[str, Any]:
     try:
         ensure_analysis_bucket()
 
-        file_path = f"{user_id}/{session_id}/feedback.json"
+        file_path = SessionPaths(user_id, session_id).feedback()
 
         # Get object from MinIO
-        response = minio_client.get_object(ANALYSIS_BUCKET, file_path)
-        data = response.read().decode("utf-8")
-        response.close()
-        response.release_conn()
-
-        return json.loads(data)
+        return load_json_object(read_object(ANALYSIS_BUCKET, file_path))
 
     except Exception as e:
-        print(f"Error getting feedback data: {str(e)}")
+        logger.error("Error getting feedback data: %s", e)
         return {}
 
 
@@ -238,20 +351,93 @@ def get_feedback_file_path(user_id: str, session_id: str) -> str:
     try:
         ensure_analysis_bucket()
 
-        file_path = f"{user_id}/{session_id}/feedback.json"
+        file_path = SessionPaths(user_id, session_id).feedback()
 
         # Check if file exists
         try:
-            minio_client.stat_object(ANALYSIS_BUCKET, file_path)
+            stat_object(ANALYSIS_BUCKET, file_path)
             return file_path
         except:
             return ""
 
     except Exception as e:
-        print(f"Error checking feedback file: {str(e)}")
+        logger.error("Error checking feedback file: %s", e)
         return ""
 
 
+def _fetch_detailed_json(paths: SessionPaths, side: str, strict: bool = False):
+    """
+    Fetch one detailed_{side}.json object, returning (side, data) or None
+
+    A missing file gives None. Other errors are logged and give None as
+    well, unless strict is set, in which case they are raised.
+    """
+    object_name = paths.detailed(side)
+    try:
+        data = read_object(ANALYSIS_BUCKET, object_name)
+        return side, load_json_object(data)
+    except S3Error as e:
+        # Sides that were not uploaded simply have no file
+        if e.code == "NoSuchKey":
+            return None
+        if strict:
+            raise
+        logger.error("Error reading %s: %s", object_name, e)
+        return None
+    except Exception as e:
+        if strict:
+            raise
+        logger.error("Error reading %s: %s", object_name, e)
+        return None
+
+
+def _fetch_detailed_sides(paths: SessionPaths, strict: bool = False) -> Dict[str, Any]:
+    """Fetch every detailed_{side}.json file of a session, keyed by side"""
+    # The side names are fixed, so GET each candidate directly instead of
+    # listing the session prefix first
+    results = io_executor.map(
+        lambda side: _fetch_detailed_json(paths, side, strict),
+        DETAILED_SIDES,
+    )
+
+    return dict(result for result in results if result is not None)
+
+
+def save_detailed_analysis_bundle(user_id: str, session_id: str) -> bool:
+    """
+    Combine a session's detailed_{side}.json files into one bundle object
+
+    Readers stop looking at the per-side files once the bundle exists, so
+    nothing is written if any side could not be read or none exist.
+
+    Args:
+        user_id: User identifier
+        session_id: Session identifier
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        ensure_analysis_bucket()
+
+        paths = SessionPaths(user_id, session_id)
+        bundle = _fetch_detailed_sides(paths, strict=True)
+        if not bundle:
+            logger.info("No detailed analysis data to bundle for %s", session_id)
+            return False
+
+        file_path = paths.detailed_bundle()
+
+        put_json_object(ANALYSIS_BUCKET, file_path, bundle)
+
+        logger.info("Saved detailed analysis bundle to %s", file_path)
+        return True
+
+    except Exception as e:
+        logger.error("Error saving detailed analysis bundle: %s", e)
+        return False
+
+
 def get_detailed_analysis_data(
     user_id: str, session_id: str, detected_side: str = None
 ) -> Dict[str, Any]:
@@ -268,47 +454,29 @@ def get_detailed_analysis_data(
     """
     try:
         ensure_analysis_bucket()
+        paths = SessionPaths(user_id, session_id)
 
         if detected_side:
             # Get specific side data
-            file_path = f"{user_id}/{session_id}/detailed_{detected_side}.json"
+            file_path = paths.detailed(detected_side)
             try:
-                response = minio_client.get_object(ANALYSIS_BUCKET, file_path)
-                data = response.read().decode("utf-8")
-                response.close()
-                response.release_conn()
-                return json.loads(data)
+                return load_json_object(read_object(ANALYSIS_BUCKET, file_path))
             except Exception:
                 return {}
         else:
-            # Get all detailed analysis files for the session
-            prefix = f"{user_id}/{session_id}/"
-            objects = minio_client.list_objects(
-                ANALYSIS_BUCKET, prefix=prefix, recursive=True
-            )
+            # Read the session bundle in one GET, falling back to the per-side
+            # files for sessions processed before bundles were written
+            file_path = paths.detailed_bundle()
+            try:
+                return load_json_object(read_object(ANALYSIS_BUCKET, file_path))
+            except S3Error as e:
+                if e.code != "NoSuchKey":
+                    raise
 
-            all_data = {}
-            for obj in objects:
-                if obj.object_name.endswith(".json") and "detailed_" in obj.object_name:
-                    try:
-                        response = minio_client.get_object(
-                            ANALYSIS_BUCKET, obj.object_name
-                        )
-                        data = response.read().decode("utf-8")
-                        response.close()
-                        response.release_conn()
-
-                        # Extract side from filename (e.g., detailed_front.json -> front)
-                        side = obj.object_name.split("detailed_")[1].split(".json")[0]
-                        all_data[side] = json.loads(data)
-                    except Exception as e:
-                        print(f"Error reading {obj.object_name}: {e}")
-                        continue
-
-            return all_data
+            return _fetch_detailed_sides(paths)
 
     except Exception as e:
-        print(f"Error getting detailed analysis data: {str(e)}")
+        logger.error("Error getting detailed analysis data: %s", e)
         return {}
 
 
@@ -326,31 +494,40 @@ def get_pdf_report_url(user_id: str, session_id: str) -> str:
     try:
         ensure_analysis_bucket()
 
-        file_path = f"{user_id}/{session_id}/{session_id}_report.pdf"
+        paths = SessionPaths(user_id, session_id)
+        file_path = paths.pdf_report()
 
-        # Generate presigned URL for the PDF report
+        # Reports are rewritten under the same name, so a cached URL stays valid
+        cached_url = get_cached_presigned_url(ANALYSIS_BUCKET, file_path)
+        if cached_url:
+            return cached_url
+
+        # Only sign URLs for reports that exist
         try:
-            # check if the PDF report exists
-            obj = minio_client.stat_object(ANALYSIS_BUCKET, file_path)
-
-            if obj:
-                url = minio_client.get_presigned_url(
-                    "GET",
-                    ANALYSIS_BUCKET,
-                    file_path,
-                    expires=timedelta(hours=1),
-                    response_headers={
-                        "response-content-type": "application/pdf",
-                        "response-content-disposition": f"attachment; filename={session_id}_report.pdf",
-                    },
-                )
-                return url
+            stat_object(ANALYSIS_BUCKET, file_path)
+        except S3Error as e:
+            if e.code != "NoSuchKey":
+                logger.error("Error checking PDF report %s: %s", file_path, e)
+            return ""
 
-        except Exception as e:
-            print(f"Error generating presigned URL for {file_path}: {e}")
+        expires_delta = timedelta(hours=1)
+        url = minio_client.get_presigned_url(
+            "GET",
+            ANALYSIS_BUCKET,
+            file_path,
+            expires=expires_delta,
+            response_headers={
+                "response-content-type": "application/pdf",
+                "response-content-disposition": f"attachment; filename={paths.report_filename}",
+            },
+        )
+        cache_presigned_url(ANALYSIS_BUCKET, file_path, url, expires_delta)
+        return url
 
     except Exception as e:
-        print(f"Error getting PDF report URL: {str(e)}")
+        logger.error("Error getting PDF report URL: %s", e)
+        return ""
+
 
 def get_pdf_report_as_bytes(user_id: str, session_id: str) -> bytes:
     """
@@ -366,20 +543,16 @@ def get_pdf_report_as_bytes(user_id: str, session_id: str) -> bytes:
     try:
         ensure_analysis_bucket()
 
-        file_path = f"{user_id}/{session_id}/{session_id}_report.pdf"
+        file_path = SessionPaths(user_id, session_id).pdf_report()
 
         # Get the PDF report as bytes
         try:
-            response = minio_client.get_object(ANALYSIS_BUCKET, file_path)
-            data = response.read()
-            response.close()
-            response.release_conn()
-            return data
+            return read_object(ANALYSIS_BUCKET, file_path)
 
         except Exception as e:
-            print(f"Error getting PDF report as bytes for {file_path}: {e}")
+            logger.error("Error getting PDF report as bytes for %s: %s", file_path, e)
 
     except Exception as e:
-        print(f"Error getting PDF report as bytes: {str(e)}")
+        logger.error("Error getting PDF report as bytes: %s", e)
 
     return b""
@@ -0,0 +1,23 @@
+import threading
+
+from google import genai
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> genai.Client:
+    """
+    Get the shared Gemini client, creating it on first use
+
+    Reusing one client keeps its HTTP connection alive between requests
+    instead of paying the TLS and auth setup on every call.
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = genai.Client()
+
+    return _client
@@ -1,23 +1,193 @@
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+import certifi
+import urllib3
 from minio import Minio
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
+from tenacity import (
+    before_sleep_log,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 from typing import List, Dict
 
 # Import caching functions
-from src.utils.cache import get_cached_presigned_url, cache_presigned_url
+from src.utils.cache import cache_session_urls, get_cached_session_urls
 from src.config.app_config import AppConfig
 
+logger = logging.getLogger(__name__)
+
 CONFIG = AppConfig()
 
+# Connections kept per host: one per gunicorn thread plus the per-view
+# upload and fetch threads those requests start
+MINIO_MAX_POOL_SIZE = int(os.getenv("MINIO_MAX_POOL_SIZE", "64"))
+
+# Same settings as the MinIO SDK's default HTTP client, with a larger pool.
+# Its Retry is the only retry for failed connects and 500/502/503/504
+# replies (SlowDown, ServiceUnavailable, ...): 6 requests at most, after
+# which urllib3 raises MaxRetryError. retry_transient below covers only the
+# failures this Retry never sees, so no call is retried by both
+_http_client = urllib3.PoolManager(
+    timeout=urllib3.util.Timeout(connect=300, read=300),
+    maxsize=MINIO_MAX_POOL_SIZE,
+    # Open an extra connection rather than wait when the pool is exhausted
+    block=False,
+    cert_reqs="CERT_REQUIRED",
+    ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+    retries=urllib3.Retry(
+        total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]
+    ),
+)
+
+# Attempts made by helpers wrapped in retry_transient, the first one included
+MINIO_RETRY_ATTEMPTS = int(os.getenv("MINIO_RETRY_ATTEMPTS", "3"))
+
+# Transient S3 error codes sent with a status the pool's Retry lets through;
+# the 5xx ones never get here, the pool retries them and then raises
+# MaxRetryError
+TRANSIENT_S3_ERROR_CODES = frozenset({"RequestTimeout"})
+
 client = Minio(
     CONFIG.minio_endpoint,
     access_key=CONFIG.minio_access_key,
     secret_key=CONFIG.minio_secret_key,
     secure=CONFIG.minio_secure,
+    http_client=_http_client,
+)
+
+# Threads shared by requests that fan out several MinIO calls at once, so a
+# request reuses warm threads instead of starting an executor of its own
+MINIO_IO_WORKERS = int(os.getenv("MINIO_IO_WORKERS", "16"))
+io_executor = ThreadPoolExecutor(
+    max_workers=MINIO_IO_WORKERS, thread_name_prefix="minio-io"
+)
+
+# Buckets known to exist, so the HEAD request is only paid once per process
+_existing_buckets = set()
+_existing_buckets_lock = threading.Lock()
+
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """Whether a failed MinIO call is worth repeating"""
+    if isinstance(exc, S3Error):
+        return exc.code in TRANSIENT_S3_ERROR_CODES
+    # Connection reset or closed while the body was being read; the pool's
+    # Retry only covers the request itself, not a body read after it
+    return isinstance(exc, urllib3.exceptions.ProtocolError)
+
+
+# Repeat a whole MinIO call on transient errors with jittered backoff;
+# other errors, such as NoSuchKey or the pool's MaxRetryError, are raised
+# straight away
+retry_transient = retry(
+    stop=stop_after_attempt(MINIO_RETRY_ATTEMPTS),
+    wait=wait_exponential_jitter(initial=0.05, max=1.0),
+    retry=retry_if_exception(_is_transient_error),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True,
 )
 
 
+@retry_transient
+def read_object(bucket_name: str, object_name: str) -> bytes:
+    """
+    Read a whole object, releasing its connection back to the pool
+
+    Args:
+        bucket_name: Name of the bucket
+        object_name: Name of the object
+
+    Returns:
+        bytes: The object body
+    """
+    response = client.get_object(bucket_name, object_name)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+@retry_transient
+def stat_object(bucket_name: str, object_name: str):
+    """Stat an object, retrying transient errors"""
+    return client.stat_object(bucket_name, object_name)
+
+
+def bucket_exists(bucket_name: str) -> bool:
+    """
+    Check whether a bucket exists, remembering buckets that have been seen
+
+    Args:
+        bucket_name: Name of the bucket
+
+    Returns:
+        bool: True if the bucket exists
+    """
+    if bucket_name in _existing_buckets:
+        return True
+
+    if client.bucket_exists(bucket_name):
+        _existing_buckets.add(bucket_name)
+        return True
+
+    return False
+
+
+def ensure_bucket(bucket_name: str) -> bool:
+    """
+    Create a bucket if it does not exist yet
+
+    Args:
+        bucket_name: Name of the bucket
+
+    Returns:
+        bool: True if the bucket was created by this call
+    """
+    if bucket_name in _existing_buckets:
+        return False
+
+    with _existing_buckets_lock:
+        if bucket_name in _existing_buckets:
+            return False
+
+        created = False
+        if not client.bucket_exists(bucket_name):
+            client.make_bucket(bucket_name)
+            created = True
+
+        _existing_buckets.add(bucket_name)
+        return created
+
+
+def iter_delete_objects(objects, on_delete=None):
+    """
+    Lazily turn a list_objects listing into DeleteObject entries
+
+    Passing the result straight to remove_objects lets the SDK page through
+    the listing while it sends delete batches, without holding every name.
+
+    Args:
+        objects: Iterable of objects returned by list_objects
+        on_delete: Optional callback called with each object name as it is queued
+
+    Yields:
+        DeleteObject: One entry per listed object
+    """
+    for obj in objects:
+        if on_delete is not None:
+            on_delete(obj.object_name)
+        yield DeleteObject(obj.object_name)
+
+
 def get_session_presigned_urls(user_id: str, session_id: str) -> Dict[str, str]:
     """
     Get presigned URLs for all media files in a session with caching
@@ -33,49 +203,48 @@ def get_session_presigned_urls(user_id: str, session_id: str) -> Dict[str, str]:
         videos_bucket = "videos"
 
         # Check if videos bucket exists
-        if not client.bucket_exists(videos_bucket):
+        if not bucket_exists(videos_bucket):
             return {}
 
         prefix = f"{user_id}/{session_id}/"
+
+        # Reuse the whole session's URLs without listing the folder again
+        cached_urls = get_cached_session_urls(videos_bucket, prefix)
+        if cached_urls is not None:
+            return cached_urls
+
         objects = client.list_objects(videos_bucket, prefix=prefix, recursive=True)
 
         presigned_urls = {}
+        expires_delta = timedelta(hours=1)
+        expires_at = time.time() + expires_delta.total_seconds()
         for obj in objects:
             try:
-                # Check cache first
-                cached_url = get_cached_presigned_url(videos_bucket, obj.object_name)
-
-                if cached_url:
-                    # Use cached URL
-                    filename = obj.object_name.split("/")[-1]
-                    side = filename.split("_")[-1].split(".")[0]
-                    presigned_urls[side] = cached_url
-                else:
-                    # Generate new presigned URL (valid for 1 hour)
-                    expires_delta = timedelta(hours=1)
-                    url = client.presigned_get_object(
-                        videos_bucket, obj.object_name, expires=expires_delta
-                    )
-
-                    # Cache the URL
-                    cache_presigned_url(
-                        videos_bucket, obj.object_name, url, expires_delta
-                    )
-
-                    # Use the full filename as the key
-                    filename = obj.object_name.split("/")[-1]
-                    # Extract side from filename
-                    side = filename.split("_")[-1]
-                    # Remove file extension
-                    side = side.split(".")[0]
-                    presigned_urls[side] = url
+                # Extract side from filename (e.g. cx_front.mp4 -> front)
+                filename = os.path.basename(obj.object_name)
+                side = os.path.splitext(filename)[0].rpartition("_")[2]
+
+                # Generate new presigned URL (valid for 1 hour); signing is
+                # local, the session cache below avoids repeating the listing
+                presigned_urls[side] = client.presigned_get_object(
+                    videos_bucket, obj.object_name, expires=expires_delta
+                )
 
             except Exception as e:
-                print(f"Error generating presigned URL for {obj.object_name}: {e}")
+                logger.error(
+                    "Error generating presigned URL for %s: %s",
+                    obj.object_name,
+                    e,
+                )
                 continue
 
+        if presigned_urls:
+            cache_session_urls(videos_bucket, prefix, presigned_urls, expires_at)
+
         return presigned_urls
 
     except Exception as e:
-        print(f"Error getting presigned URLs for session {session_id}: {str(e)}")
+        logger.error(
+            "Error getting presigned URLs for session %s: %s", session_id, e
+        )
         return {}
@@ -1,118 +1,148 @@
-import os
+import io
+import tempfile
 
+from markupsafe import escape
 from weasyprint import HTML
 
 from src.models.analysis import Analysis
 
+# Reports are written to memory up to this size before spilling to disk
+PDF_SPOOL_MAX_SIZE = 8 * 1024 * 1024
 
-def render_analysis_info(analysis: Analysis):
-    return f"""
-    <section>
-      <div class="section-title">Analysis Metadata</div>
-      <div class="feedback-block">
-        <p><strong>Analysis ID:</strong> {analysis.id}</p>
-        <p><strong>User ID:</strong> {analysis.user_id}</p>
-        <p><strong>Session ID:</strong> {analysis.session_id}</p>
-        <p><strong>Model Name:</strong> {analysis.model_name}</p>
-        <p><strong>Status:</strong> {analysis.status}</p>
-        <p><strong>Created At:</strong> {analysis.created_at}</p>
-      </div>
-    </section>
-    <div class="page-break"></div>
-    """
-
-
-def render_entry(label, entry):
-    blocks = []
-
-    if "critique" in entry:
-        blocks.append(f'<div class="label">{label}:</div>')
-        blocks.append(f'<div class="critique">{entry["critique"]}</div>')
-
-    if "commendation" in entry:
-        blocks.append(f'<div class="label">{label}:</div>')
-        blocks.append(f'<div class="commendation">{entry["commendation"]}</div>')
-
-    if "suggestions" in entry:
-        blocks.append(
-            "<ul>" + "".join(f"<li>{s}</li>" for s in entry["suggestions"]) + "</ul>"
-        )
-
-    return "\n".join(blocks)
-
-
-def render_section(title, view_data):
-    section_html = [f'<section><div class="section-title">{title} View</div>']
-    for key, entry in view_data.items():
-        section_html.append('<div class="feedback-block">')
-        section_html.append(render_entry(key.replace("_", " ").title(), entry))
-        section_html.append("</div>")
-    section_html.append("</section>")
-    return "\n".join(section_html)
-
-
-def generate_pdf_report(analysis: Analysis, feedback_data):
-    html_sections = []
-
-    html_sections.append(render_analysis_info(analysis))
-
-    for view, view_data in feedback_data.items():
-        html_sections.append(render_section(view.title(), view_data))
-        html_sections.append('<div class="page-break"></div>')
-
-    html_contents = f"""
+# Document shell around the rendered sections
+_REPORT_HEAD = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
   <meta charset="UTF-8">
   <title>Posture Feedback Report</title>
   <style>
-    body {{
+    body {
       font-family: Arial, sans-serif;
       padding: 40px;
       color: #333;
       line-height: 1.6;
-    }}
-    h1 {{
+    }
+    h1 {
       text-align: center;
       margin-bottom: 40px;
-    }}
-    .section-title {{
+    }
+    .section-title {
       background-color: #f0f0f0;
       padding: 10px;
       font-size: 22px;
       border-left: 6px solid #007BFF;
-    }}
-    .feedback-block {{
+    }
+    .feedback-block {
       margin: 15px 0;
       padding-left: 20px;
-    }}
-    .label {{
+    }
+    .label {
       font-weight: bold;
       font-size: 16px;
       margin-top: 10px;
-    }}
-    .commendation {{
+    }
+    .commendation {
       color: green;
-    }}
-    .critique {{
+    }
+    .critique {
       color: #d9534f;
-    }}
-    ul {{
+    }
+    ul {
       margin-top: 5px;
-    }}
-    .page-break {{
+    }
+    .page-break {
       page-break-after: always;
-    }}
+    }
   </style>
 </head>
 <body>
   <h1>Posture Feedback Report</h1>
-  {''.join(html_sections)}
-</body>
+"""
+
+_REPORT_TAIL = """</body>
 </html>
 """
 
-    pdf_bytes = HTML(string=html_contents).write_pdf()
 
-    return pdf_bytes
+def render_analysis_info(buf, analysis: Analysis):
+    buf.write(f"""
+    <section>
+      <div class="section-title">Analysis Metadata</div>
+      <div class="feedback-block">
+        <p><strong>Analysis ID:</strong> {escape(analysis.id)}</p>
+        <p><strong>User ID:</strong> {escape(analysis.user_id)}</p>
+        <p><strong>Session ID:</strong> {escape(analysis.session_id)}</p>
+        <p><strong>Model Name:</strong> {escape(analysis.model_name)}</p>
+        <p><strong>Status:</strong> {escape(analysis.status)}</p>
+        <p><strong>Created At:</strong> {escape(analysis.created_at)}</p>
+      </div>
+    </section>
+    <div class="page-break"></div>
+    """)
+
+
+def render_entry(buf, label, entry):
+    label = escape(label)
+
+    if "critique" in entry:
+        buf.write(f'<div class="label">{label}:</div>\n')
+        buf.write(f'<div class="critique">{escape(entry["critique"])}</div>\n')
+
+    if "commendation" in entry:
+        buf.write(f'<div class="label">{label}:</div>\n')
+        buf.write(f'<div class="commendation">{escape(entry["commendation"])}</div>\n')
+
+    if "suggestions" in entry:
+        buf.write("<ul>")
+        for s in entry["suggestions"]:
+            buf.write(f"<li>{escape(s)}</li>")
+        buf.write("</ul>\n")
+
+
+def render_section(buf, title, view_data):
+    buf.write(f'<section><div class="section-title">{escape(title)} View</div>\n')
+    for key, entry in view_data.items():
+        buf.write('<div class="feedback-block">\n')
+        render_entry(buf, key.replace("_", " ").title(), entry)
+        buf.write("</div>\n")
+    buf.write("</section>\n")
+
+
+def generate_pdf_report(analysis: Analysis, feedback_data, target=None):
+    """
+    Render the feedback report as a PDF
+
+    Returns the PDF bytes, or writes the PDF into target (a file object)
+    and returns None when one is given.
+    """
+    # The whole document is written into one buffer in a single pass
+    buf = io.StringIO()
+    buf.write(_REPORT_HEAD)
+
+    render_analysis_info(buf, analysis)
+
+    for view, view_data in feedback_data.items():
+        render_section(buf, view.title(), view_data)
+        buf.write('<div class="page-break"></div>')
+
+    buf.write(_REPORT_TAIL)
+    html_contents = buf.getvalue()
+
+    return HTML(string=html_contents).write_pdf(target=target)
+
+
+def spool_pdf_report(analysis: Analysis, feedback_data):
+    """
+    Render the feedback report into a spooled temporary file
+
+    The caller owns the returned file and should close it, e.g. with a
+    with-statement, after uploading it.
+    """
+    pdf_file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    try:
+        generate_pdf_report(analysis, feedback_data, target=pdf_file)
+    except Exception:
+        pdf_file.close()
+        raise
+    return pdf_file
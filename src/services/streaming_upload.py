@@ -0,0 +1,260 @@
+import io
+import os
+import queue
+import tempfile
+import threading
+
+from streaming_form_data.targets import BaseTarget
+
+from src.services.minio import client as minio_client
+
+# MinIO multipart part size used for uploads of unknown length
+UPLOAD_PART_SIZE = 10 * 1024 * 1024
+
+# Parts that arrive before the object name is known are kept in memory up to
+# this size before spilling to disk
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
+# Returned by a resolver when the object name is not known yet
+DEFER_UPLOAD = object()
+
+
+class UploadRejected(Exception):
+    """Raised by a resolver to skip a file part without uploading it"""
+
+
+class UploadAborted(Exception):
+    """Raised inside put_object when the request body ends prematurely"""
+
+
+class _ChunkStream:
+    """
+    Minimal file-like object fed by the multipart parser and read by put_object
+
+    The queue is bounded so the parser blocks when MinIO falls behind,
+    keeping memory use to a few chunks per part.
+    """
+
+    _EOF = object()
+
+    def __init__(self, max_chunks=64):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._buffer = bytearray()
+        self._eof = False
+        self.abandoned = False
+
+    def feed(self, chunk):
+        while not self.abandoned:
+            try:
+                self._chunks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        self.feed(self._EOF)
+
+    def abort(self):
+        self.feed(UploadAborted("Request body ended before the file part was complete"))
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._chunks.get()
+            if chunk is self._EOF:
+                self._eof = True
+            elif isinstance(chunk, Exception):
+                raise chunk
+            else:
+                self._buffer.extend(chunk)
+
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+
+class UnexpectedPartTarget(BaseTarget):
+    """
+    Catch-all target for the parts no other target was registered for
+
+    The parser only passes part names to matchers, so matches() remembers
+    the name of the part it claims. File parts are reported through
+    on_file(name) when they start; their data and plain fields are dropped.
+    Register it last, with matches as its matcher.
+    """
+
+    def __init__(self, on_file):
+        super().__init__()
+        self.on_file = on_file
+        self._part_name = None
+
+    def matches(self, _registered_name, part_name):
+        self._part_name = part_name
+        return True
+
+    def on_start(self):
+        if self.multipart_filename is not None:
+            self.on_file(self._part_name)
+
+    def on_data_received(self, chunk):
+        pass
+
+
+class MinioUploadTarget(BaseTarget):
+    """
+    streaming-form-data target that pipes a file part straight into MinIO
+
+    When the part starts, resolve_object_name(filename) is called to name
+    the object. put_object then runs on a background thread and reads the
+    part as the parser receives it, so the file is never held in full.
+    If the resolver returns DEFER_UPLOAD the part is spooled to a temporary
+    file instead and can be uploaded later with upload_deferred().
+
+    With buffered=True (for request bodies smaller than one part) the part
+    is collected in memory and sent with a single PUT of known length when
+    it ends, instead of starting an upload thread.
+    """
+
+    def __init__(
+        self, bucket, resolve_object_name, part_size=UPLOAD_PART_SIZE, buffered=False
+    ):
+        super().__init__()
+        self.bucket = bucket
+        self.resolve_object_name = resolve_object_name
+        self.part_size = part_size
+        self.buffered = buffered
+
+        self.received = False
+        self.finished = False
+        self.object_name = None
+        self.error = None
+        self.rejected = False
+
+        self._stream = None
+        self._thread = None
+        self._spool = None
+        self._buffer = None
+
+    @property
+    def content_type(self):
+        return self.multipart_content_type or "application/octet-stream"
+
+    @property
+    def deferred(self):
+        return self._spool is not None
+
+    @property
+    def uploaded(self):
+        return self.object_name is not None and self.error is None and not self.deferred
+
+    def on_start(self):
+        self.received = True
+
+        try:
+            object_name = self.resolve_object_name(self.multipart_filename)
+        except UploadRejected as e:
+            self.rejected = True
+            self.error = str(e)
+            return
+
+        if object_name is DEFER_UPLOAD:
+            self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+            return
+
+        self.object_name = object_name
+        if self.buffered:
+            self._buffer = bytearray()
+            return
+
+        self._stream = _ChunkStream()
+        self._thread = threading.Thread(target=self._upload, daemon=True)
+        self._thread.start()
+
+    def on_data_received(self, chunk):
+        if self._spool is not None:
+            self._spool.write(chunk)
+        elif self._buffer is not None:
+            self._buffer.extend(chunk)
+        elif self._thread is not None and self.error is None:
+            self._stream.feed(chunk)
+
+    def on_finish(self):
+        self.finished = True
+
+        if self._buffer is not None:
+            buffer, self._buffer = self._buffer, None
+            try:
+                minio_client.put_object(
+                    self.bucket,
+                    self.object_name,
+                    io.BytesIO(buffer),
+                    length=len(buffer),
+                    content_type=self.content_type,
+                )
+            except Exception as e:
+                self.error = str(e)
+
+        if self._thread is not None:
+            self._stream.close()
+            self._thread.join()
+            self._thread = None
+
+    def abort(self):
+        """Fail an in-flight upload so MinIO discards the partial object"""
+        self.finished = True
+
+        if self._thread is not None:
+            self._stream.abort()
+            self._thread.join()
+            self._thread = None
+            self.error = self.error or "Upload incomplete"
+
+        if self._buffer is not None:
+            self._buffer = None
+            self.error = self.error or "Upload incomplete"
+
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+            self.error = self.error or "Upload incomplete"
+
+    def upload_deferred(self, object_name):
+        """Upload a part that was spooled because its name was not known"""
+        spool, self._spool = self._spool, None
+        self.object_name = object_name
+
+        try:
+            # The spooled size is known, so MinIO can skip measuring the stream
+            length = spool.seek(0, os.SEEK_END)
+            spool.seek(0)
+            minio_client.put_object(
+                self.bucket,
+                object_name,
+                spool,
+                length=length,
+                part_size=self.part_size,
+                content_type=self.content_type,
+            )
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            spool.close()
+
+    def _upload(self):
+        try:
+            minio_client.put_object(
+                self.bucket,
+                self.object_name,
+                self._stream,
+                length=-1,
+                part_size=self.part_size,
+                content_type=self.content_type,
+            )
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            # Unblock the parser if put_object stopped reading early
+            self._stream.abandoned = True
@@ -1,23 +1,37 @@
-import json
-import io
+import logging
 from datetime import timedelta, datetime
+from email.utils import parsedate_to_datetime
 from typing import Dict, Any, List
+import pytz
 from minio.error import S3Error
 from src.services.minio import client as minio_client
-from src.services.analysis_bucket_minio import ensure_analysis_bucket, ANALYSIS_BUCKET
+from src.services.minio import ensure_bucket, io_executor
+from src.services.minio import read_object, retry_transient, stat_object
+from src.models.analysis import Analysis
+from src.services.analysis_bucket_minio import (
+    ANALYSIS_BUCKET,
+    SessionPaths,
+    ensure_analysis_bucket,
+    load_json_object,
+    put_json_object,
+)
 from src.utils.cache import get_cached_presigned_url, cache_presigned_url
 
+logger = logging.getLogger(__name__)
+
 SUMMARY_BUCKET = "summary"
 
+# Singapore timezone, the zone analysis timestamps are stored in
+SGT = pytz.timezone("Asia/Singapore")
+
 
 def ensure_summary_bucket():
     """Ensure the summary bucket exists"""
     try:
-        if not minio_client.bucket_exists(SUMMARY_BUCKET):
-            minio_client.make_bucket(SUMMARY_BUCKET)
-            print(f"Created bucket: {SUMMARY_BUCKET}")
+        if ensure_bucket(SUMMARY_BUCKET):
+            logger.info("Created bucket: %s", SUMMARY_BUCKET)
     except S3Error as e:
-        print(f"Error ensuring summary bucket: {e}")
+        logger.error("Error ensuring summary bucket: %s", e)
         raise
 
 
@@ -38,24 +52,14 @@ def save_posture_insights(user_id: str, insights_data: Dict[str, Any]) -> bool:
         # Create file path: user_id/posture_insights.json
         file_path = f"{user_id}/posture_insights.json"
 
-        # Convert insights data to JSON
-        json_data = json.dumps(insights_data, indent=2, default=str)
-        json_bytes = json_data.encode("utf-8")
-
-        # Upload to MinIO
-        minio_client.put_object(
-            SUMMARY_BUCKET,
-            file_path,
-            io.BytesIO(json_bytes),
-            length=len(json_bytes),
-            content_type="application/json",
-        )
+        # Convert insights data to JSON and upload to MinIO
+        put_json_object(SUMMARY_BUCKET, file_path, insights_data)
 
-        print(f"Successfully saved posture insights to {file_path}")
+        logger.info("Successfully saved posture insights to %s", file_path)
         return True
 
     except Exception as e:
-        print(f"Error saving posture insights: {str(e)}")
+        logger.error("Error saving posture insights: %s", e)
         return False
 
 
@@ -74,15 +78,12 @@ def get_posture_insights(user_id: str) -> Dict[str, Any]:
 
         file_path = f"{user_id}/posture_insights.json"
 
-        # Get object from MinIO
-        response = minio_client.get_object(SUMMARY_BUCKET, file_path)
-        data = json.loads(response.read().decode("utf-8"))
-        response.close()
-
-        return data
+        # Get object from MinIO; urllib3 undoes the stored Content-Encoding:
+        # gzip, so read() returns the plain JSON bytes
+        return load_json_object(read_object(SUMMARY_BUCKET, file_path))
 
     except Exception as e:
-        print(f"Error getting posture insights: {str(e)}")
+        logger.error("Error getting posture insights: %s", e)
         return {}
 
 
@@ -101,17 +102,18 @@ def get_posture_insights_presigned_url(user_id: str) -> str:
 
         file_path = f"{user_id}/posture_insights.json"
 
-        # Check if file exists first
-        try:
-            minio_client.stat_object(SUMMARY_BUCKET, file_path)
-        except:
-            return ""
-
-        # Check cache first
+        # Check cache first; insights are rewritten under the same name, so a
+        # URL cached for them stays valid until it expires
         cached_url = get_cached_presigned_url(SUMMARY_BUCKET, file_path)
         if cached_url:
             return cached_url
 
+        # Only sign a URL for a file that exists
+        try:
+            stat_object(SUMMARY_BUCKET, file_path)
+        except:
+            return ""
+
         # Generate new presigned URL if not cached
         try:
             expires_delta = timedelta(hours=1)
@@ -124,14 +126,52 @@ def get_posture_insights_presigned_url(user_id: str) -> str:
             return url
             
         except Exception as e:
-            print(f"Error generating presigned URL for {file_path}: {e}")
+            logger.error(
+                "Error generating presigned URL for %s: %s", file_path, e
+            )
             return ""
 
     except Exception as e:
-        print(f"Error getting posture insights presigned URL: {str(e)}")
+        logger.error("Error getting posture insights presigned URL: %s", e)
         return ""
 
 
+@retry_transient
+def _read_feedback_object(file_path: str):
+    """Read a feedback.json object, returning (data, Last-Modified datetime)"""
+    response = minio_client.get_object(ANALYSIS_BUCKET, file_path)
+    try:
+        feedback_data = load_json_object(response.read())
+        last_modified = parsedate_to_datetime(response.headers["Last-Modified"])
+    finally:
+        response.close()
+        response.release_conn()
+
+    return feedback_data, last_modified
+
+
+def _fetch_feedback(file_path: str) -> Dict[str, Any]:
+    """Fetch one feedback.json object with its metadata, or None if missing"""
+    try:
+        # Get the feedback data
+        feedback_data, last_modified = _read_feedback_object(file_path)
+
+        # Add metadata
+        feedback_data["session_path"] = file_path
+        feedback_data["created_date"] = last_modified.isoformat()
+
+        return feedback_data
+
+    except S3Error as e:
+        # Sessions that failed or are still running have no feedback yet
+        if e.code != "NoSuchKey":
+            logger.error("Error reading feedback file %s: %s", file_path, e)
+        return None
+    except Exception as e:
+        logger.error("Error reading feedback file %s: %s", file_path, e)
+        return None
+
+
 def get_user_weekly_feedback_data(user_id: str) -> List[Dict[str, Any]]:
     """
     Get all feedback data for a user from the current week
@@ -145,44 +185,34 @@ def get_user_weekly_feedback_data(user_id: str) -> List[Dict[str, Any]]:
     try:
         ensure_analysis_bucket()
 
-        # Get current date and calculate week start
-        today = datetime.now()
+        # Get current date and calculate week start; created_at is stored in
+        # Singapore time, so the week is computed in the same zone
+        today = datetime.now(SGT).replace(tzinfo=None)
         week_start = today - timedelta(days=today.weekday())
         week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
 
-        prefix = f"{user_id}/"
-        objects = minio_client.list_objects(
-            ANALYSIS_BUCKET, prefix=prefix, recursive=True
+        # Take this week's sessions from the (user_id, created_at) index
+        # instead of listing every object the user has ever stored
+        weekly_sessions = (
+            Analysis.query.with_entities(Analysis.session_id)
+            .filter(Analysis.user_id == int(user_id), Analysis.created_at >= week_start)
+            .order_by(Analysis.created_at)
+            .all()
         )
-
-        weekly_feedback = []
-        for obj in objects:
-            # Only process feedback.json files
-            if obj.object_name.endswith("/feedback.json"):
-                # Check if file was created this week
-                if obj.last_modified.replace(tzinfo=None) >= week_start:
-                    try:
-                        # Get the feedback data
-                        response = minio_client.get_object(
-                            ANALYSIS_BUCKET, obj.object_name
-                        )
-                        feedback_data = json.loads(response.read().decode("utf-8"))
-                        response.close()
-
-                        # Add metadata
-                        feedback_data["session_path"] = obj.object_name
-                        feedback_data["created_date"] = obj.last_modified.isoformat()
-
-                        weekly_feedback.append(feedback_data)
-
-                    except Exception as e:
-                        print(
-                            f"Error reading feedback file {obj.object_name}: {str(e)}"
-                        )
-                        continue
+        file_paths = [
+            SessionPaths(user_id, session_id).feedback()
+            for (session_id,) in weekly_sessions
+        ]
+
+        # Fetch the files concurrently instead of one round trip at a time
+        weekly_feedback = [
+            feedback_data
+            for feedback_data in io_executor.map(_fetch_feedback, file_paths)
+            if feedback_data is not None
+        ]
 
         return weekly_feedback
 
     except Exception as e:
-        print(f"Error getting weekly feedback data: {str(e)}")
+        logger.error("Error getting weekly feedback data: %s", e)
         return []
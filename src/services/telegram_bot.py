@@ -1,17 +1,32 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
+import logging
+import queue
+import threading
 
+from flask import current_app
 from telegram import Bot
+from telegram.error import RetryAfter
 from telegramify_markdown import markdownify
 
 from src.config.app_config import AppConfig
+from src.config.database import db
 from src.models import Analysis, User
 from src.services.analysis_bucket_minio import get_pdf_report_as_bytes
 
+logger = logging.getLogger(__name__)
+
 CONFIG = AppConfig()
 TELEGRAM_TOKEN = CONFIG.telegram_bot_token
 bot = Bot(token=TELEGRAM_TOKEN)
 
+# Alerts are sent by one background worker with its own long-lived event
+# loop, so analysis processing never waits on Telegram and sends are
+# naturally serialized under Telegram's rate limits
+_alert_jobs = queue.Queue(maxsize=1024)
+_alert_worker_started = False
+_alert_worker_lock = threading.Lock()
+
 
 STATUS_EMOJI = {
     "in_progress": "⏳",
@@ -19,42 +34,112 @@ STATUS_EMOJI = {
     "failed": "❌"
 }
 
+# Built once at import; only the per-analysis fields are filled in per send
+ANALYSIS_MESSAGE_TEMPLATE = "\n".join([
+    "**🔫 Gun Posture Analysis Result**",
+    f"[Click here to view the full detailed analysis]({CONFIG.frontend_url}/uploads/{{id}})",
+    "**Analysis ID: `{id}`**",
+    "**Session ID:** `{session_id}`",
+    "**Date:** `{created_at}`",
+    "**Model Used:** `{model_name}`",
+    "**Status:** `{status_emoji} {status}`",
+])
+
 
 def format_analysis_message(analysis):
     created_at = analysis["created_at"]
 
-    # Parse and format created_at to human readable string
+    # Format created_at to a human readable string, parsing it only when it
+    # arrives as an ISO string rather than a datetime
     try:
-        dt = datetime.fromisoformat(created_at)
+        dt = datetime.fromisoformat(created_at) if isinstance(created_at, str) else created_at
         created_at_str = dt.strftime("%A, %d %B %Y %I:%M %p")
     except Exception:
         created_at_str = str(created_at)
 
-    msg = [
-        "**🔫 Gun Posture Analysis Result**",
-        f"[Click here to view the full detailed analysis]({CONFIG.frontend_url}/uploads/{analysis['id']})",
-        f"**Analysis ID: `{analysis['id']}`**",
-        f"**Session ID:** `{analysis['session_id']}`",
-        f"**Date:** `{created_at_str}`",
-        f"**Model Used:** `{analysis['model_name']}`",
-        f"**Status:** `{STATUS_EMOJI.get(analysis['status'], '')} {analysis['status']}`",
-    ]
-
-    markdownified_text = markdownify("\n".join(msg))
+    markdownified_text = markdownify(
+        ANALYSIS_MESSAGE_TEMPLATE.format(
+            id=analysis["id"],
+            session_id=analysis["session_id"],
+            created_at=created_at_str,
+            model_name=analysis["model_name"],
+            status_emoji=STATUS_EMOJI.get(analysis["status"], ""),
+            status=analysis["status"],
+        )
+    )
     return markdownified_text
 
 
 def send_alert_sync(user_id, analysis: Analysis):
+    """
+    Queue an analysis alert for a user without waiting for it to be sent
+
+    Must be called inside an application context; the worker reloads the
+    analysis by id in its own context before sending.
+    """
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(
-            send_analysis(user_id, analysis, is_alert=True)
-        )
-        loop.close()
+        if analysis.id is None:
+            logger.warning("Not sending alert to user %s: analysis has no id", user_id)
+            return
+
+        _ensure_alert_worker(current_app._get_current_object())
+        _alert_jobs.put_nowait((user_id, analysis.id))
 
+    except queue.Full:
+        logger.warning("Alert queue full, dropping alert for user %s", user_id)
     except Exception as e:
-        print(f"Error sending alert to user {user_id}: {str(e)}")
+        logger.exception("Error queueing alert for user %s: %s", user_id, e)
+
+
+async def _send_alert(user_id, analysis: Analysis):
+    """Send an alert, waiting out Telegram's flood control once if hit"""
+    try:
+        await send_analysis(user_id, analysis, is_alert=True)
+    except RetryAfter as e:
+        delay = e.retry_after
+        if isinstance(delay, timedelta):
+            delay = delay.total_seconds()
+        await asyncio.sleep(delay)
+        await send_analysis(user_id, analysis, is_alert=True)
+
+
+def _alert_worker(app):
+    """Pop queued alerts and send them on one reused event loop"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    while True:
+        user_id, analysis_id = _alert_jobs.get()
+        try:
+            with app.app_context():
+                analysis = Analysis.query.filter_by(id=analysis_id).first()
+                if analysis is not None:
+                    loop.run_until_complete(_send_alert(user_id, analysis))
+
+        except Exception as e:
+            logger.exception("Error sending alert to user %s: %s", user_id, e)
+        finally:
+            _alert_jobs.task_done()
+
+
+def _ensure_alert_worker(app):
+    """Start the alert worker thread on first use"""
+    global _alert_worker_started
+
+    with _alert_worker_lock:
+        if _alert_worker_started:
+            return
+
+        threading.Thread(
+            target=_alert_worker, args=(app,), name="telegram-alerts", daemon=True
+        ).start()
+        _alert_worker_started = True
+
+
+def get_telegram_id(user_id):
+    """Return the user's linked Telegram chat id, or None if not linked"""
+    # Only the one column is selected; most users have no Telegram linked
+    return db.session.query(User.telegram_id).filter_by(id=user_id).scalar()
 
 
 async def send_analysis(
@@ -64,26 +149,24 @@ async def send_analysis(
     Send a message to a Telegram user or group by chat_id.
     Usage: send_analysis(123456789, "Hello from PostureX!")
     """
-    user = User.query.filter_by(id=user_id).first()
-
-    if not user:
-        return
-
-    if not user.telegram_id:
+    telegram_id = get_telegram_id(user_id)
+    if not telegram_id:
         return
 
     analysis_dict = analysis.to_dict()
+    # Hand the datetime through as-is instead of round-tripping it via isoformat
+    analysis_dict["created_at"] = analysis.created_at
 
     # check analysis status
     if analysis_dict["status"] == "in_progress":
         return await bot.send_message(
-            chat_id=user.telegram_id,
+            chat_id=telegram_id,
             text="Your analysis is still in progress. Please check back later.",
         )
 
     if analysis_dict["status"] == "failed":
         return await bot.send_message(
-            chat_id=user.telegram_id,
+            chat_id=telegram_id,
             text=markdownify(
                 f"An error occured while trying to process your analysis with ID `{analysis.id}`. You may try again [here]({CONFIG.frontend_url}/analysis/{analysis.id})."
             ),
@@ -95,10 +178,13 @@ async def send_analysis(
     if is_alert:
         msg = markdownify(f"Your gun posture analysis is ready!\n\n{msg}")
 
-    pdf_report_bytes = get_pdf_report_as_bytes(analysis.user_id, analysis.session_id)
+    # Download on a worker thread so the bot's event loop keeps serving updates
+    pdf_report_bytes = await asyncio.to_thread(
+        get_pdf_report_as_bytes, analysis.user_id, analysis.session_id
+    )
 
     await bot.send_document(
-        chat_id=user.telegram_id,
+        chat_id=telegram_id,
         caption=msg,
         document=pdf_report_bytes,
         filename=f"{analysis.session_id}_report.pdf",
@@ -110,17 +196,14 @@ async def send_analysis_error(user_id: int, analysis: Analysis):
     """
     Send an error message to a Telegram user or group by chat_id.
     """
-    user = User.query.filter_by(id=user_id).first()
-    if not user:
-        return
-
-    if not user.telegram_id:
+    telegram_id = get_telegram_id(user_id)
+    if not telegram_id:
         return
 
     analysis_link = f"[here]({CONFIG.frontend_url}/analysis/)"
 
     await bot.send_message(
-        chat_id=user.telegram_id,
+        chat_id=telegram_id,
         parse_mode="MarkdownV2",
         text=markdownify(
             f"An error occurred when trying to process your latest upload with ID `{analysis.id}`. Please try again {analysis_link}."
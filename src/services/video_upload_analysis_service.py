@@ -2,11 +2,13 @@ import cv2
 import numpy as np
 import asyncio
 import websockets
-import json
-import base64
+from websockets.protocol import State
+import orjson
 import os
 import math
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
 import pytz
 from typing import Dict, List
@@ -14,72 +16,136 @@ from ..config.websocket_config import WEBSOCKET_HOST
 from flask_jwt_extended import get_jwt_identity, decode_token
 from flask import request
 from .analysis_bucket_minio import save_detailed_analysis_data
-from .minio import client as minio_client
+from .minio import bucket_exists, client as minio_client, iter_delete_objects
+from ..utils.cache import invalidate_session_urls
 
 # Singapore timezone
 SGT = pytz.timezone('Asia/Singapore')
 
+# JPEG quality of frames sent for inference; 95 is OpenCV's default
+INFERENCE_JPEG_QUALITY = int(os.getenv("INFERENCE_JPEG_QUALITY", "95"))
+
+
+class InferenceAuthError(Exception):
+    """Raised when the inference service rejects the service token"""
+
 class MediaAnalysisService:
     """Service for analyzing videos and images using the WebSocket inference service"""
 
-    def __init__(self, websocket_host=WEBSOCKET_HOST, websocket_port=8894, service_token=None):
+    # Video frames sent to the inference service before their replies arrive
+    MAX_FRAMES_IN_FLIGHT = 8
+
+    VIDEO_EXTENSIONS = frozenset({'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v'})
+    IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp'})
+
+    def __init__(self, websocket_host=WEBSOCKET_HOST, websocket_port=8894, service_token=None, jpeg_quality=INFERENCE_JPEG_QUALITY, token_factory=None):
         self.websocket_host = websocket_host
         self.websocket_port = websocket_port
         self.service_token = service_token
+        # Called for a fresh token on every connect, so a service that
+        # reconnects late in a long session never sends an expired one
+        self.token_factory = token_factory
+        # Frames are sent at full resolution: the server converts pixel
+        # distances to centimetres with a fixed calibration. Baseline,
+        # non-optimized Huffman coding keeps the encoder on its fast path
+        self._encode_params = [
+            cv2.IMWRITE_JPEG_QUALITY, jpeg_quality,
+            cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+            cv2.IMWRITE_JPEG_PROGRESSIVE, 0,
+        ]
+        self._websocket = None
+        # Replies are matched to requests by order, so one analysis at a
+        # time may use the shared connection
+        self._connection_lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Yield an authenticated WebSocket connection to the inference service
+
+        The connection stays open after a successful analysis so the next
+        file analyzed by this service skips the connect and authentication
+        round trips. It is discarded if anything fails while it is in use.
+        Concurrent analyses on the same service wait for their turn; a
+        caller that needs to drop the connection calls close() before
+        leaving the block.
+        """
+        async with self._connection_lock:
+            if self._websocket is None or self._websocket.state is not State.OPEN:
+                self._websocket = await self._connect()
+
+            try:
+                yield self._websocket
+            except BaseException:
+                await self.close()
+                raise
+
+    async def _connect(self):
+        """Open a WebSocket connection and wait for the authentication reply"""
+        # Add token as query parameter for authentication
+        token = self.token_factory() if self.token_factory is not None else self.service_token
+        uri = f"ws://{self.websocket_host}:{self.websocket_port}?token={token}"
+
+        websocket = await websockets.connect(
+            uri,
+            ping_interval=20,
+            ping_timeout=10,
+            close_timeout=10
+        )
+        print('Connected to WebSocket')
+
+        try:
+            # Wait for authentication response (automatic with query parameter)
+            auth_response = await websocket.recv()
+            auth_data = orjson.loads(auth_response)
+        except BaseException:
+            await websocket.close()
+            raise
+
+        # Handle authentication response
+        if auth_data.get('status') != 'authenticated':
+            await websocket.close()
+            raise InferenceAuthError(auth_data.get('error', 'Unknown error'))
+
+        print(f'Authentication successful, user ID: {auth_data.get("user_id")}')
+        return websocket
+
+    async def close(self):
+        """Close the kept-open inference connection, if any"""
+        websocket, self._websocket = self._websocket, None
+        if websocket is not None:
+            await websocket.close()
     
     def is_video_file(self, file_path: str) -> bool:
         """Check if file is a video based on extension"""
-        video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v'}
-        return os.path.splitext(file_path.lower())[1] in video_extensions
+        return os.path.splitext(file_path)[1].lower() in self.VIDEO_EXTENSIONS
     
     def is_image_file(self, file_path: str) -> bool:
         """Check if file is an image based on extension"""
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp'}
-        return os.path.splitext(file_path.lower())[1] in image_extensions
+        return os.path.splitext(file_path)[1].lower() in self.IMAGE_EXTENSIONS
     
-    async def analyze_image(self, image_path: str, view: str = None, user_id: str = None, session_id: str = None) -> Dict:
+    async def analyze_image(self, image_path: str, view: str = None, user_id: str = None, session_id: str = None, image_data: bytes = None) -> Dict:
         """
         Analyze a single image file using WebSocket connection similar to JavaScript client
+
+        If image_data is provided, the image is decoded from those bytes instead of read from image_path.
         """
         try:
             # Load image
-            image = cv2.imread(image_path)
+            if image_data is not None:
+                image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            else:
+                image = cv2.imread(image_path)
             if image is None:
                 return {"error": f"Could not load image: {image_path}", "view": view}
             
-            # Add token as query parameter for authentication
-            uri = f"ws://{self.websocket_host}:{self.websocket_port}?token={self.service_token}"
-            
-            async with websockets.connect(
-                uri,
-                ping_interval=20,
-                ping_timeout=10,
-                close_timeout=10
-            ) as websocket:
-                print('Connected to WebSocket')
-                
-                # Wait for authentication response (automatic with query parameter)
-                auth_response = await websocket.recv()
-                auth_data = json.loads(auth_response)
-                
-                # Handle authentication response
-                if auth_data.get('status') == 'authenticated':
-                    print(f'Authentication successful, user ID: {auth_data.get("user_id")}')
-                else:
-                    return {"error": f"Authentication failed: {auth_data.get('error', 'Unknown error')}", "view": view}
-
-                # Convert image to base64
-                frame_b64 = self.frame_to_base64(image)
-                
-                # Send image for inference
-                message = {
-                    "image": frame_b64
-                }
-                await websocket.send(json.dumps(message))
+            async with self.connection() as websocket:
+                # Send the JPEG-encoded image as a binary message for inference
+                await websocket.send(self.encode_frame(image))
                 
                 # Receive keypoints and posture score
                 response = await websocket.recv()
-                result = json.loads(response)
+                result = orjson.loads(response)
                 
                 if result:
                     keypoints = result.get("keypoints", {})
@@ -99,13 +165,15 @@ class MediaAnalysisService:
                         detected_view = 'front'
                         print(f"Image: User specified 'front' view, confirmed by model detection")
                     
+                    analysis_timestamp = datetime.now(SGT).isoformat()
+
                     # Save detailed analysis data to MinIO if user_id and session_id are provided
                     if user_id and session_id:
                         detailed_data = {
                             "file_type": "image",
                             "view": view,
                             "detected_view": detected_view,
-                            "analysis_timestamp": datetime.now(SGT).isoformat(),
+                            "analysis_timestamp": analysis_timestamp,
                             "image_data": {
                                 "keypoints": keypoints,
                                 "score": posture_score,  # This already has 'side' popped out
@@ -128,13 +196,15 @@ class MediaAnalysisService:
                         "measurements": measurements,
                         "frame_count": 1,
                         "total_frames": 1,
-                        "analysis_timestamp": datetime.now(SGT).isoformat(),
+                        "analysis_timestamp": analysis_timestamp,
                         "file_type": "image",
                     }
                 
                 else:
                     return {"error": f"Invalid response from inference service: {result}", "view": view}
             
+        except InferenceAuthError as e:
+            return {"error": f"Authentication failed: {e}", "view": view}
         except websockets.exceptions.ConnectionClosed as e:
             print(f"WebSocket connection closed unexpectedly in analyze_image: {e}")
             return {"error": f"WebSocket connection closed: {e}", "view": view}
@@ -157,14 +227,21 @@ class MediaAnalysisService:
         analysis_id = str(uuid.uuid4())[:8]
         print(f"[{analysis_id}] Starting video analysis for {video_path}")
         
+        cap = None
+        frame_worker = None
         try:
-            # Try different OpenCV backends for better compatibility
-            cap = None
-            backends = [cv2.CAP_FFMPEG, cv2.CAP_DSHOW, cv2.CAP_ANY]
+            # Open with FFMPEG, first on a hardware decoder when one is
+            # available, then in software; CAP_ANY is the last resort. Camera
+            # backends such as DirectShow cannot open files and are not tried
+            backends = [
+                (cv2.CAP_FFMPEG, [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]),
+                (cv2.CAP_FFMPEG, []),
+                (cv2.CAP_ANY, []),
+            ]
             
-            for backend in backends:
+            for backend, params in backends:
                 try:
-                    cap = cv2.VideoCapture(video_path, backend)
+                    cap = cv2.VideoCapture(video_path, backend, params)
                     if cap.isOpened():
                         print(f"[{analysis_id}] Successfully opened video with backend: {backend}")
                         break
@@ -184,7 +261,6 @@ class MediaAnalysisService:
             fps = cap.get(cv2.CAP_PROP_FPS)
             
             if total_frames <= 0:
-                cap.release()
                 return {"error": f"Invalid video file - no frames detected: {video_path}", "view": view}
             
             # Frame skip interval (process every nth frame)
@@ -202,66 +278,83 @@ class MediaAnalysisService:
             # Collect detailed frame data for MinIO storage
             detailed_frames_data = []
             
+            # OpenCV decodes and encodes frames on a worker thread (releasing
+            # the GIL), so the next frame is prepared while earlier replies
+            # are handled. A single worker also serializes every use of cap,
+            # including the release in finally, even if the sender is cancelled
+            loop = asyncio.get_running_loop()
+            frame_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-reader")
+
+            def read_next_frame():
+                nonlocal frame_idx
+                # Only process every nth frame based on frame_skip interval.
+                # Skipped frames are only grabbed, which advances the
+                # stream without converting the frame to a BGR image
+                while frame_idx % frame_skip != 0:
+                    if not cap.grab():
+                        return None
+                    frame_idx += 1
+
+                ret, frame = cap.read()
+                return frame if ret else None
+
             # Connect to WebSocket inference service
-            uri = f"ws://{self.websocket_host}:{self.websocket_port}?token={self.service_token}"
-            
-            async with websockets.connect(
-                uri,
-                ping_interval=20,
-                ping_timeout=10,
-                close_timeout=10
-            ) as websocket:
-                print(f'[{analysis_id}] Connected to WebSocket for video analysis')
-                
-                # Wait for authentication response (automatic with query parameter)
-                auth_response = await websocket.recv()
-                auth_data = json.loads(auth_response)
-                
-                # Handle authentication response
-                if auth_data.get('status') == 'authenticated':
-                    print(f'[{analysis_id}] Authentication successful, user ID: {auth_data.get("user_id")}')
-                else:
-                    cap.release()
-                    return {"error": f"Authentication failed: {auth_data.get('error', 'Unknown error')}", "view": view}
-                
-                while True:
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-                    
-                    # Only process every nth frame based on frame_skip interval
-                    if frame_idx % frame_skip == 0:
+            async with self.connection() as websocket:
+                # The server answers each frame with exactly one message, in
+                # order, so frames are sent ahead of the replies instead of
+                # waiting a full round trip per frame. The queue holds the
+                # indices of frames awaiting a reply and bounds how far ahead
+                # the sender gets.
+                in_flight = asyncio.Queue(maxsize=self.MAX_FRAMES_IN_FLIGHT)
+
+                async def send_frames():
+                    nonlocal frame_idx, processed_frame_count
+                    while True:
+                        frame = await loop.run_in_executor(frame_worker, read_next_frame)
+                        if frame is None:
+                            break
+
                         processed_frame_count += 1
                         print(f"[{analysis_id}] Processing frame {frame_idx}/{total_frames} (processed: {processed_frame_count})")
                         try:
-                            # Convert frame to base64
-                            frame_b64 = self.frame_to_base64(frame)
-                            
-                            # Send frame for inference
-                            message = {
-                                "image": frame_b64
-                            }
-                            await websocket.send(json.dumps(message))
-                            
-                            # Receive keypoints and posture score
-                            response = await websocket.recv()
-                            result = json.loads(response)
-                            
+                            # JPEG-encode the frame, sent as a binary message
+                            message = await loop.run_in_executor(frame_worker, self.encode_frame, frame)
+                        except Exception as e:
+                            print(f"[{analysis_id}] Error encoding frame {frame_idx}: {e}")
+                        else:
+                            await in_flight.put(frame_idx)
+                            await websocket.send(message)
+
+                        frame_idx += 1
+
+                    await in_flight.put(None)
+
+                async def receive_results():
+                    while True:
+                        sent_idx = await in_flight.get()
+                        if sent_idx is None:
+                            break
+
+                        # Receive keypoints and posture score
+                        response = await websocket.recv()
+                        try:
+                            result = orjson.loads(response)
+
                             if "keypoints" in result and "posture_score" in result:
                                 keypoints = result.get("keypoints", {})
                                 posture_score = result.get("posture_score", {})
                                 measurements = result.get("measurements", {})
                                 raw_scores_percent = result.get("raw_scores_percent", {})
-                                
+
                                 frame_scores.append(posture_score)
                                 frame_measurements.append(measurements)
                                 raw_scores_percent_list.append(raw_scores_percent)
-                                
+
                                 # Collect detailed frame data for MinIO storage
                                 if user_id and session_id:
                                     frame_data = {
-                                        "frame_index": frame_idx,
-                                        "timestamp": frame_idx / fps if fps > 0 else 0,
+                                        "frame_index": sent_idx,
+                                        "timestamp": sent_idx / fps if fps > 0 else 0,
                                         "keypoints": keypoints,
                                         "score": posture_score.copy(),  # Make a copy since we'll modify posture_score later
                                         "raw_scores_percent": raw_scores_percent,
@@ -269,14 +362,33 @@ class MediaAnalysisService:
                                     }
                                     detailed_frames_data.append(frame_data)
                             else:
-                                print(f"[{analysis_id}] Invalid result for frame {frame_idx}: {result}")
+                                print(f"[{analysis_id}] Invalid result for frame {sent_idx}: {result}")
 
                         except Exception as e:
-                            print(f"[{analysis_id}] Error processing frame {frame_idx}: {e}")
-                    
-                    frame_idx += 1
-            
-            cap.release()
+                            print(f"[{analysis_id}] Error processing frame {sent_idx}: {e}")
+
+                tasks = {
+                    asyncio.create_task(send_frames()),
+                    asyncio.create_task(receive_results()),
+                }
+                done, pending = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_EXCEPTION
+                )
+                # If one side failed (e.g. the connection closed), stop the other
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                pipeline_failed = False
+                for task in done:
+                    # Like a failed frame, keep whatever results arrived
+                    if task.exception() is not None:
+                        pipeline_failed = True
+                        print(f"[{analysis_id}] Frame pipeline stopped: {task.exception()}")
+
+                # Replies may still be pending, so the connection cannot be
+                # reused; it is closed before the lock lets anyone else in
+                if pipeline_failed:
+                    await self.close()
             
             print(f"[{analysis_id}] Finished processing video. Total frames: {total_frames}, Processed frames: {len(frame_scores)}, Expected frames: {processed_frame_count}")
             
@@ -316,6 +428,8 @@ class MediaAnalysisService:
             
             return result
             
+        except InferenceAuthError as e:
+            return {"error": f"Authentication failed: {e}", "view": view}
         except websockets.exceptions.ConnectionClosed as e:
             print(f"WebSocket connection closed unexpectedly in analyze_video: {e}")
             return {"error": f"WebSocket connection closed: {e}", "view": view}
@@ -328,12 +442,67 @@ class MediaAnalysisService:
         except Exception as e:
             print(f"Error in analyze_video: {str(e)}")
             return {"error": str(e), "view": view}
+        finally:
+            if frame_worker is not None:
+                # Queued behind any read still running on the worker
+                await loop.run_in_executor(frame_worker, cap.release)
+                frame_worker.shutdown(wait=False)
+            elif cap is not None:
+                cap.release()
     
-    def frame_to_base64(self, frame) -> str:
-        """Convert OpenCV frame to base64 string"""
-        _, buffer = cv2.imencode('.jpg', frame)
-        frame_b64 = base64.b64encode(buffer).decode('utf-8')
-        return frame_b64
+    def encode_frame(self, frame) -> memoryview:
+        """
+        Encode an OpenCV frame as JPEG
+
+        Returns a flat byte view over the encoder's output buffer rather than
+        copying it into bytes; websockets sends any bytes-like object as a
+        binary frame. Depending on the OpenCV version the buffer is (N,) or
+        (N, 1), so it is flattened to keep len() equal to the byte count.
+        """
+        ok, buffer = cv2.imencode('.jpg', frame, self._encode_params)
+        if not ok:
+            raise ValueError("Could not encode frame as JPEG")
+        return buffer.reshape(-1).data
+
+    def average_frame_metrics(self, frames: List[Dict], exclude=()) -> Dict:
+        """
+        Average each numeric metric across per-frame dicts
+
+        The frames are packed into one (frames x metrics) array with NaN for
+        missing or non-numeric values, so every metric is averaged in a
+        single vectorized pass. Metrics with no numeric value are left out.
+        """
+        frames = [frame for frame in frames if isinstance(frame, dict)]
+        metrics = [
+            metric
+            for metric in dict.fromkeys(key for frame in frames for key in frame)
+            if metric not in exclude
+        ]
+        if not metrics or not frames:
+            return {}
+
+        values = np.fromiter(
+            (
+                value if isinstance(value, (int, float)) else np.nan
+                for frame in frames
+                for value in (frame.get(metric) for metric in metrics)
+            ),
+            dtype=np.float64,
+            count=len(frames) * len(metrics),
+        ).reshape(len(frames), len(metrics))
+
+        valid = ~np.isnan(values)
+        counts = valid.sum(axis=0)
+        sums = np.where(valid, values, 0.0).sum(axis=0)
+
+        # Divide in one vector op and hand back plain Python floats
+        means = (sums / np.maximum(counts, 1)).tolist()
+
+        return {
+            metric: means[i]
+            for i, metric in enumerate(metrics)
+            if counts[i]
+        }
 
     def aggregate_frame_scores(self, frame_scores: List[Dict], frame_measurements: List[Dict], raw_scores_percent: List[Dict], view: str, total_frames: int) -> Dict:
         """Aggregate frame scores and measurements into final analysis result"""
@@ -390,57 +559,15 @@ class MediaAnalysisService:
         selected_measurements = measurements_by_side[most_common_side]
         selected_raw_scores = raw_scores_by_side[most_common_side]
         
-        # Calculate average posture scores (excluding 'side' field)
-        avg_scores = {}
-        for score in selected_frame_scores:
-            if isinstance(score, dict):
-                for metric, value in score.items():
-                    if metric == 'side':  # Skip the 'side' field during averaging
-                        continue
-                    if metric not in avg_scores:
-                        avg_scores[metric] = []
-                    if isinstance(value, (int, float)):
-                        avg_scores[metric].append(value)
-        
-        final_scores = {}
-        for metric, values in avg_scores.items():
-            if values:
-                final_scores[metric] = np.mean(values)
-
-        # Calculate average raw scores percent
-        avg_raw_scores = {}
-        for raw_score in selected_raw_scores:
-            if isinstance(raw_score, dict):
-                for metric, value in raw_score.items():
-                    if metric not in avg_raw_scores:
-                        avg_raw_scores[metric] = []
-                    if isinstance(value, (int, float)):
-                        avg_raw_scores[metric].append(value)
-        
-        final_raw_scores_percent = {}
-        for metric, values in avg_raw_scores.items():
-            if values:
-                final_raw_scores_percent[metric] = np.mean(values)  
-        
-        # Calculate average measurements
-        avg_measurements = {}
-        for measurements in selected_measurements:
-            if isinstance(measurements, dict):
-                for metric, value in measurements.items():
-                    if metric not in avg_measurements:
-                        avg_measurements[metric] = []
-                    if isinstance(value, (int, float)):
-                        avg_measurements[metric].append(value)
-        
-        # Calculate averages for measurements
-        final_measurements = {}
-        for metric, values in avg_measurements.items():
-            if values:
-                final_measurements[metric] = np.mean(values)
-
-        # Calculate overall score from numeric values only (exclude 'side' field)
-        numeric_scores = {k: v for k, v in final_scores.items() if k != "side" and isinstance(v, (int, float))}
-        overall_score = np.mean(list(numeric_scores.values())) if numeric_scores else 0
+        # Calculate average posture scores (excluding 'side' field),
+        # raw scores percent and measurements
+        final_scores = self.average_frame_metrics(selected_frame_scores, exclude=('side',))
+        final_raw_scores_percent = self.average_frame_metrics(selected_raw_scores)
+        final_measurements = self.average_frame_metrics(selected_measurements)
+
+        # Overall score is the mean of the averaged metrics; average_frame_metrics
+        # already dropped 'side' and non-numeric values
+        overall_score = sum(final_scores.values()) / len(final_scores) if final_scores else 0
         
         # Create a copy of final_scores for the main result (includes 'side')
         final_scores_with_side = final_scores.copy()
@@ -462,7 +589,7 @@ class MediaAnalysisService:
                 "user_specified_view": view,
                 "frames_used_for_aggregation": len(selected_frame_scores)
             },
-            "analysis_timestamp": asyncio.get_event_loop().time()
+            "analysis_timestamp": datetime.now(SGT).isoformat()
         }
 
         return result
@@ -482,7 +609,7 @@ def delete_session_video_files(user_id: str, session_id: str) -> bool:
         videos_bucket = "videos"
         
         # Check if videos bucket exists
-        if not minio_client.bucket_exists(videos_bucket):
+        if not bucket_exists(videos_bucket):
             print(f"Videos bucket '{videos_bucket}' does not exist")
             return True  # Consider this successful since there are no files to delete
         
@@ -490,11 +617,22 @@ def delete_session_video_files(user_id: str, session_id: str) -> bool:
         objects = minio_client.list_objects(videos_bucket, prefix=prefix, recursive=True)
         
         deleted_count = 0
-        for obj in objects:
-            minio_client.remove_object(videos_bucket, obj.object_name)
+
+        def count_deleted(_object_name):
+            nonlocal deleted_count
             deleted_count += 1
-            print(f"Deleted video file: {obj.object_name}")
-            
+
+        delete_errors = list(
+            minio_client.remove_objects(
+                videos_bucket, iter_delete_objects(objects, count_deleted)
+            )
+        )
+        invalidate_session_urls(videos_bucket, prefix)
+        for error in delete_errors:
+            print(f"Error deleting video file {error.name}: {error.message}")
+        if delete_errors:
+            return False
+
         print(f"Deleted {deleted_count} video files for session {session_id}")
         return True
         
@@ -1,3 +1,4 @@
 from .helpers import setup_logging
+from .json_provider import ORJSONProvider
 
-__all__ = ['setup_logging']
+__all__ = ['setup_logging', 'ORJSONProvider']
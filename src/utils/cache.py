@@ -1,15 +1,21 @@
 """
 Presigned URL caching utilities for MinIO operations
 """
+import logging
 import time
 import threading
 from datetime import timedelta
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 # In-memory cache for presigned URLs
 presigned_url_cache = {}
 cache_lock = threading.Lock()
 
+# In-memory cache of every presigned URL in a session folder, keyed by side
+session_url_cache = {}
+
 # Cache cleanup thread control
 _cleanup_thread = None
 _cleanup_running = False
@@ -46,6 +52,43 @@ def cache_presigned_url(bucket: str, file_path: str, url: str, expires_delta: ti
         presigned_url_cache[cache_key] = (url, expires_at)
 
 
+def invalidate_presigned_url(bucket: str, file_path: str) -> None:
+    """Forget a cached presigned URL after its object is removed"""
+    with cache_lock:
+        presigned_url_cache.pop(get_cache_key(bucket, file_path), None)
+
+
+def get_cached_session_urls(bucket: str, prefix: str) -> Optional[Dict[str, str]]:
+    """Get the cached presigned URLs of a session folder if still valid"""
+    with cache_lock:
+        cache_key = get_cache_key(bucket, prefix)
+        cached_entry = session_url_cache.get(cache_key)
+
+        if cached_entry:
+            urls, expires_at = cached_entry
+            # Same 5 minute buffer as single presigned URLs
+            if time.time() < (expires_at - 300):
+                return dict(urls)
+            else:
+                del session_url_cache[cache_key]
+
+        return None
+
+
+def cache_session_urls(
+    bucket: str, prefix: str, urls: Dict[str, str], expires_at: float
+) -> None:
+    """Cache the presigned URLs of a session folder until the earliest expiry"""
+    with cache_lock:
+        session_url_cache[get_cache_key(bucket, prefix)] = (dict(urls), expires_at)
+
+
+def invalidate_session_urls(bucket: str, prefix: str) -> None:
+    """Forget the cached URLs of a session folder after its files change"""
+    with cache_lock:
+        session_url_cache.pop(get_cache_key(bucket, prefix), None)
+
+
 def cleanup_expired_cache() -> None:
     """Clean up expired cache entries"""
     with cache_lock:
@@ -56,9 +99,20 @@ def cleanup_expired_cache() -> None:
         ]
         for key in expired_keys:
             del presigned_url_cache[key]
+
+        expired_session_keys = [
+            key for key, (urls, expires_at) in session_url_cache.items()
+            if current_time >= expires_at
+        ]
+        for key in expired_session_keys:
+            del session_url_cache[key]
+        expired_keys.extend(expired_session_keys)
         
         if expired_keys:
-            print(f"Cleaned up {len(expired_keys)} expired presigned URL cache entries")
+            logger.info(
+                "Cleaned up %s expired presigned URL cache entries",
+                len(expired_keys),
+            )
 
 
 def get_cache_stats() -> dict:
@@ -99,7 +153,7 @@ def _cache_cleanup_worker():
             # Clean up every 5 minutes
             time.sleep(300)
         except Exception as e:
-            print(f"Error in cache cleanup worker: {e}")
+            logger.error("Error in cache cleanup worker: %s", e)
             time.sleep(60)  # Wait a minute before retrying
 
 
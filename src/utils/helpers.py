@@ -1,9 +1,38 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 from typing import Any, Dict
 
+_log_listener = None
+
+
 def setup_logging():
-    """Setup application logging"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    """Setup application logging
+
+    Records are pushed onto a queue by the calling thread and written to
+    the console by a background listener, so request and worker threads
+    never block on stdout.
+    """
+    global _log_listener
+
+    if _log_listener is not None:
+        return
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(
+        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     )
+
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, console_handler, respect_handler_level=True
+    )
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+    # The queue handler only renders the message; the listener adds the prefix
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
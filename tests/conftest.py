@@ -0,0 +1,14 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The API is imported as the src package; the model server is a standalone
+# script that imports its config as a top-level module
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "websocket_script_for_model_server"))
+
+# The MinIO client and the Telegram bot are built at import time; they only
+# need settings that look valid, tests never reach either server
+os.environ.setdefault("MINIO_ENDPOINT", "localhost:9000")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:test")
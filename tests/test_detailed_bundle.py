@@ -0,0 +1,67 @@
+import orjson
+import pytest
+
+pytest.importorskip("minio")
+analysis_bucket = pytest.importorskip("src.services.analysis_bucket_minio")
+
+from minio.error import S3Error  # noqa: E402
+
+
+def s3_error(code):
+    return S3Error(
+        code=code,
+        message=code,
+        resource=None,
+        request_id=None,
+        host_id=None,
+        response=None,
+    )
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """Per-side objects by name, or the error reading them raises"""
+    objects = {}
+    written = {}
+
+    def read_object(bucket, object_name):
+        value = objects.get(object_name, s3_error("NoSuchKey"))
+        if isinstance(value, Exception):
+            raise value
+        return orjson.dumps(value)
+
+    monkeypatch.setattr(analysis_bucket, "ensure_analysis_bucket", lambda: None)
+    monkeypatch.setattr(analysis_bucket, "read_object", read_object)
+    monkeypatch.setattr(
+        analysis_bucket,
+        "put_json_object",
+        lambda bucket, file_path, data: written.__setitem__(file_path, data),
+    )
+    return objects, written
+
+
+def test_bundle_combines_the_sides_that_exist(stored):
+    objects, written = stored
+    objects["1/s/detailed_front.json"] = {"view": "front"}
+    objects["1/s/detailed_left.json"] = {"view": "left"}
+
+    assert analysis_bucket.save_detailed_analysis_bundle("1", "s")
+    assert written == {
+        "1/s/detailed.json": {"front": {"view": "front"}, "left": {"view": "left"}}
+    }
+
+
+def test_bundle_is_not_written_when_a_side_cannot_be_read(stored):
+    objects, written = stored
+    objects["1/s/detailed_front.json"] = {"view": "front"}
+    objects["1/s/detailed_left.json"] = s3_error("InternalError")
+
+    assert not analysis_bucket.save_detailed_analysis_bundle("1", "s")
+    assert written == {}
+
+
+def test_bundle_is_not_written_without_detailed_data(stored):
+    _, written = stored
+
+    assert not analysis_bucket.save_detailed_analysis_bundle("1", "s")
+    assert written == {}
@@ -0,0 +1,96 @@
+import asyncio
+
+import numpy as np
+import orjson
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+websockets = pytest.importorskip("websockets")
+service = pytest.importorskip("src.services.video_upload_analysis_service")
+
+from websockets.asyncio.server import serve  # noqa: E402
+
+
+def make_frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(120, 160, 3), dtype=np.uint8)
+
+
+def test_encode_frame_returns_flat_byte_view():
+    analyzer = service.MediaAnalysisService(service_token="token")
+
+    view = analyzer.encode_frame(make_frame())
+
+    assert view.ndim == 1
+    assert view.itemsize == 1
+    assert len(view) == view.nbytes
+    assert cv2.imdecode(np.frombuffer(view, dtype=np.uint8), cv2.IMREAD_COLOR).shape == (120, 160, 3)
+
+
+def test_analyze_image_sends_encoded_frame_as_binary_message():
+    received = []
+
+    async def handler(websocket):
+        await websocket.send(orjson.dumps({"status": "authenticated", "user_id": "test"}).decode())
+        async for message in websocket:
+            received.append(message)
+            await websocket.send(
+                orjson.dumps(
+                    {
+                        "keypoints": [[1.0, 2.0, 0.9]],
+                        "posture_score": {"side": "left", "knee_angle": 0.25},
+                        "raw_scores_percent": {"knee_angle": 100.0},
+                        "measurements": {"knee_angle": 165.0},
+                    }
+                ).decode()
+            )
+
+    async def run():
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            analyzer = service.MediaAnalysisService(
+                websocket_host="127.0.0.1", websocket_port=port, service_token="token"
+            )
+            ok, png = cv2.imencode(".png", make_frame())
+            try:
+                return await analyzer.analyze_image("frame.png", "left", image_data=png.tobytes())
+            finally:
+                await analyzer.close()
+
+    result = asyncio.run(run())
+
+    assert "error" not in result
+    assert result["detected_view"] == "left"
+    assert len(received) == 1
+    assert isinstance(received[0], bytes)
+    decoded = cv2.imdecode(np.frombuffer(received[0], dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (120, 160, 3)
+
+
+def test_each_connection_uses_a_fresh_token_from_the_factory():
+    tokens = []
+
+    async def handler(websocket):
+        tokens.append(websocket.request.path)
+        await websocket.send(orjson.dumps({"status": "authenticated", "user_id": "test"}).decode())
+        await websocket.wait_closed()
+
+    minted = iter(["token-1", "token-2"])
+
+    async def run():
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            analyzer = service.MediaAnalysisService(
+                websocket_host="127.0.0.1",
+                websocket_port=port,
+                token_factory=lambda: next(minted),
+            )
+            for _ in range(2):
+                async with analyzer.connection():
+                    pass
+                # A failed pipeline drops the connection before the next file
+                await analyzer.close()
+
+    asyncio.run(run())
+
+    assert tokens == ["/?token=token-1", "/?token=token-2"]
@@ -0,0 +1,46 @@
+import numpy as np
+import orjson
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("websockets")
+pytest.importorskip("flask_jwt_extended")
+
+import websocket_model_inference_service as server  # noqa: E402
+
+
+NUM_KEYPOINTS = 133  # COCO-WholeBody
+
+
+def make_instances(seed):
+    rng = np.random.default_rng(seed)
+    keypoints = rng.uniform((200, 100), (900, 1000), size=(NUM_KEYPOINTS, 2))
+    scores = rng.uniform(0.3, 1.0, size=NUM_KEYPOINTS)
+    return [{"keypoints": keypoints.tolist(), "keypoint_scores": scores.tolist()}]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_real_reply_serializes(seed):
+    reply = server.build_inference_reply(make_instances(seed))
+    assert "error" not in reply
+
+    decoded = orjson.loads(server.encode_reply(reply))
+
+    assert len(decoded["keypoints"]) == NUM_KEYPOINTS
+    assert decoded["posture_score"]["side"] == reply["posture_score"]["side"]
+    assert set(decoded["measurements"]) == set(reply["measurements"])
+    assert set(decoded["raw_scores_percent"]) == set(reply["raw_scores_percent"])
+
+
+def test_numpy_scalars_and_nan_are_written_as_json():
+    reply = {"measurements": {"leg_spread": np.float64(12.5), "back_angle": np.float64("nan")}}
+
+    assert orjson.loads(server.encode_reply(reply)) == {
+        "measurements": {"leg_spread": 12.5, "back_angle": None}
+    }
+
+
+def test_unserializable_reply_becomes_an_error_reply():
+    decoded = orjson.loads(server.encode_reply({"measurements": {"leg_spread": object()}}))
+
+    assert "Could not serialize reply" in decoded["error"]
@@ -0,0 +1,184 @@
+import http.server
+import socket
+import socketserver
+import threading
+
+import pytest
+
+urllib3 = pytest.importorskip("urllib3")
+pytest.importorskip("minio")
+minio_service = pytest.importorskip("src.services.minio")
+
+from minio import Minio  # noqa: E402
+from minio.error import S3Error  # noqa: E402
+
+
+def s3_error(code):
+    return S3Error(
+        code=code,
+        message=code,
+        resource=None,
+        request_id=None,
+        host_id=None,
+        response=None,
+    )
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+        self.released = False
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakeClient:
+    """Fails get_object with the given errors, then returns a response"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.responses = []
+
+    def get_object(self, bucket_name, object_name):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        response = FakeResponse(b"body")
+        self.responses.append(response)
+        return response
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(minio_service.read_object.retry, "sleep", lambda _: None)
+    monkeypatch.setattr(urllib3.util.Retry, "sleep", lambda self, response=None: None)
+
+
+@pytest.fixture
+def fake_client(monkeypatch, no_backoff):
+    def install(*errors):
+        client = FakeClient(*errors)
+        monkeypatch.setattr(minio_service, "client", client)
+        return client
+
+    return install
+
+
+def test_read_object_retries_transient_errors(fake_client):
+    client = fake_client(
+        urllib3.exceptions.ProtocolError("Connection reset by peer"),
+        s3_error("RequestTimeout"),
+    )
+
+    assert minio_service.read_object("analysis-data", "a.json") == b"body"
+    assert client.calls == 3
+    assert client.responses[0].released
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        s3_error("NoSuchKey"),
+        # Raised by the pool once its own Retry is used up
+        urllib3.exceptions.MaxRetryError(None, "/", "too many 503 error responses"),
+    ],
+)
+def test_read_object_does_not_retry_other_errors(fake_client, error):
+    client = fake_client(error)
+
+    with pytest.raises(type(error)):
+        minio_service.read_object("analysis-data", "a.json")
+    assert client.calls == 1
+
+
+def test_read_object_gives_up_after_the_retry_budget(fake_client):
+    attempts = minio_service.MINIO_RETRY_ATTEMPTS
+    client = fake_client(*(s3_error("RequestTimeout") for _ in range(attempts)))
+
+    with pytest.raises(S3Error):
+        minio_service.read_object("analysis-data", "a.json")
+    assert client.calls == attempts
+
+
+class StubS3Handler(http.server.BaseHTTPRequestHandler):
+    """Answers every GET the way the server's mode says"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.mode == "reset":
+            # Promise a body, then drop the connection part way through it
+            self.send_response(200)
+            self.send_header("Content-Length", "1000")
+            self.end_headers()
+            self.wfile.write(b"x" * 10)
+            self.wfile.flush()
+            self.connection.shutdown(socket.SHUT_RDWR)
+            self.close_connection = True
+            return
+
+        status, code = self.server.mode
+        body = f"<Error><Code>{code}</Code><Message>{code}</Message></Error>".encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub_server(monkeypatch, no_backoff):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), StubS3Handler)
+    server.daemon_threads = True
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # The real client settings, pointed at the stub
+    client = Minio(
+        f"127.0.0.1:{server.server_address[1]}",
+        access_key="access",
+        secret_key="secret",
+        secure=False,
+        region="us-east-1",
+        http_client=minio_service._http_client,
+    )
+    monkeypatch.setattr(minio_service, "client", client)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_5xx_replies_are_retried_by_the_pool_only(stub_server):
+    stub_server.mode = (503, "SlowDown")
+
+    with pytest.raises(urllib3.exceptions.MaxRetryError):
+        minio_service.read_object("analysis-data", "a.json")
+    # One request plus the pool's five retries, none repeated by tenacity
+    assert stub_server.requests == 6
+
+
+@pytest.mark.parametrize(
+    "mode, error",
+    [
+        ((400, "RequestTimeout"), S3Error),
+        ("reset", urllib3.exceptions.ProtocolError),
+    ],
+)
+def test_failures_the_pool_lets_through_are_retried(stub_server, mode, error):
+    stub_server.mode = mode
+
+    with pytest.raises(error):
+        minio_service.read_object("analysis-data", "a.json")
+    assert stub_server.requests == minio_service.MINIO_RETRY_ATTEMPTS
@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("streaming_form_data")
+streaming_upload = pytest.importorskip("src.services.streaming_upload")
+
+from streaming_form_data import StreamingFormDataParser  # noqa: E402
+from streaming_form_data.targets import ValueTarget  # noqa: E402
+
+BOUNDARY = "boundary"
+
+
+def multipart_body(*parts):
+    """Build a multipart body from (name, filename or None, data) parts"""
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+            + data
+            + b"\r\n"
+        )
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def test_unexpected_part_target_reports_only_unmatched_file_parts():
+    parser = StreamingFormDataParser(
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    front = ValueTarget()
+    parser.register("front", front, lambda _, name: name.lower() == "front")
+
+    unexpected = []
+    catch_all = streaming_upload.UnexpectedPartTarget(unexpected.append)
+    parser.register("*", catch_all, catch_all.matches)
+
+    parser.data_received(
+        multipart_body(
+            ("Front", "a.mp4", b"front video"),
+            ("top", "b.mp4", b"top video"),
+            ("comment", None, b"not a file"),
+        )
+    )
+
+    assert front.value == b"front video"
+    assert unexpected == ["top"]
@@ -2,6 +2,7 @@ import asyncio
 import websockets
 import json
 import itertools
+import orjson
 import numpy as np
 import math
 import cv2
@@ -9,7 +10,6 @@ import base64
 from flask_jwt_extended import decode_token
 import jwt
 from jwt.exceptions import InvalidTokenError
-from mmpose.apis import MMPoseInferencer
 from websocket_config import (
     WEBSOCKET_HOST,
     MODEL_CONFIGS,
@@ -19,27 +19,42 @@ from websocket_config import (
     PIXELS_TO_CM_VERTICAL,
 )
 
-# Load model per gpu at startup for multiple models
+# Models are loaded per gpu at startup for multiple models, by
+# load_inferencers() in main(), so importing this module stays cheap
 NUM_GPUS = 4
 model_names = list(MODEL_CONFIGS.keys())
-inferencers = {
-    model_name: (
-        [
-            MMPoseInferencer(
-                MODEL_CONFIGS[model_name]["model_config"],
-                pose2d_weights=MODEL_CONFIGS[model_name]["checkpoint_path"],
-                device=f"cuda:{i}",
-            )
-            for i in range(NUM_GPUS)
-        ]
-        if MODEL_CONFIGS[model_name]["model_config"] is not None
-        else None
-    )
-    for model_name in model_names
-}
+inferencers = {}
+
+
+def load_inferencers():
+    """Load one inferencer per GPU for every configured model"""
+    from mmpose.apis import MMPoseInferencer
+
+    for model_name in model_names:
+        inferencers[model_name] = (
+            [
+                MMPoseInferencer(
+                    MODEL_CONFIGS[model_name]["model_config"],
+                    pose2d_weights=MODEL_CONFIGS[model_name]["checkpoint_path"],
+                    device=f"cuda:{i}",
+                )
+                for i in range(NUM_GPUS)
+            ]
+            if MODEL_CONFIGS[model_name]["model_config"] is not None
+            else None
+        )
 
 gpu_cycle = itertools.cycle(range(NUM_GPUS))
 
+# Frames that are already queued on a connection are inferred together, up
+# to MAX_BATCH_SIZE, waiting at most BATCH_WAIT_SECONDS for more to arrive
+MAX_BATCH_SIZE = 8
+BATCH_WAIT_SECONDS = 0.005
+
+# The posture metrics are NumPy scalars, which orjson only writes with
+# OPT_SERIALIZE_NUMPY; NaN and infinite values are written as null
+REPLY_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
 
 async def authenticate_websocket(websocket):
     """Authenticate WebSocket connection using JWT token from query parameters"""
@@ -98,6 +113,20 @@ async def authenticate_websocket(websocket):
         return False
 
 
+def decode_image(img_bytes):
+    """Decode encoded image bytes (e.g. JPEG) to opencv/numpy image format"""
+    try:
+        # Convert bytes to numpy array
+        img_array = np.frombuffer(img_bytes, dtype=np.uint8)
+
+        # Decode image using OpenCV
+        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+
+        return img
+    except Exception:
+        return None
+
+
 def decode_image_from_base64(img_b64):
     """Decode base64 image string to opencv/numpy image format"""
     try:
@@ -671,6 +700,80 @@ def posture_score_from_keypoints(keypoints):
         return posture_score, measurements, raw_scores_percent
 
 
+def decode_message(message):
+    """Decode an inference request (binary JPEG or legacy JSON text) to an image"""
+    if isinstance(message, bytes):
+        # Binary frames carry the encoded image as-is
+        return decode_image(message)
+
+    img_b64 = orjson.loads(message).get("image")
+    if img_b64 is None:
+        raise ValueError("No image provided")
+
+    return decode_image_from_base64(img_b64)
+
+
+def build_inference_reply(instances):
+    """Turn the pose predictions for one image into the reply sent to the client"""
+    if not instances:
+        return {"error": "No person detected"}
+
+    # Extract keypoints and scores separately, then combine them
+    prediction = instances[0]
+    keypoints_xy = prediction.get("keypoints", None)
+    keypoint_scores = prediction.get("keypoint_scores", None)
+
+    if keypoints_xy is None or keypoint_scores is None:
+        return {"error": "Invalid keypoint data"}
+
+    # Convert to numpy arrays (without copying if they already are) and combine [x, y, score] format
+    keypoints_xy = np.asarray(keypoints_xy)
+    keypoint_scores = np.asarray(keypoint_scores)
+
+    if keypoints_xy.shape[0] != keypoint_scores.shape[0]:
+        return {"error": "Keypoint data mismatch"}
+
+    keypoints = np.column_stack([keypoints_xy, keypoint_scores])
+    posture_score, measurement, raw_scores_percent = posture_score_from_keypoints(keypoints)
+
+    return {
+        "keypoints": keypoints.tolist(),  # Convert numpy array to list for JSON serialization
+        "posture_score": posture_score,
+        "raw_scores_percent": raw_scores_percent,
+        "measurements": measurement,
+    }
+
+
+def encode_reply(reply):
+    """
+    Serialize a reply as a JSON text frame
+
+    A reply that cannot be serialized is replaced by an error reply, so the
+    client still gets exactly one answer for the frame.
+    """
+    try:
+        return orjson.dumps(reply, option=REPLY_JSON_OPTIONS).decode()
+    except TypeError as e:
+        return orjson.dumps({"error": f"Could not serialize reply: {e}"}).decode()
+
+
+async def receive_batch(websocket):
+    """
+    Wait for one message, then collect any others that arrive within
+    BATCH_WAIT_SECONDS, up to MAX_BATCH_SIZE
+
+    Clients pipeline several frames at once, so the queued ones can be run
+    through the model together as a single GPU batch.
+    """
+    batch = [await websocket.recv()]
+    while len(batch) < MAX_BATCH_SIZE:
+        try:
+            batch.append(await asyncio.wait_for(websocket.recv(), BATCH_WAIT_SECONDS))
+        except (asyncio.TimeoutError, websockets.ConnectionClosed):
+            break
+    return batch
+
+
 async def handle_inference(websocket, model_name: str):
     """Handle WebSocket connection with JWT authentication and inference"""
     # Perform authentication handshake (path will be extracted from websocket object)
@@ -678,65 +781,57 @@ async def handle_inference(websocket, model_name: str):
         await websocket.close()
         return
 
-    async for message in websocket:
+    while True:
         try:
-            data = json.loads(message)
-            img_b64 = data.get("image")
-            if img_b64 is None:
-                await websocket.send(json.dumps({"error": "No image provided"}))
+            messages = await receive_batch(websocket)
+        except websockets.ConnectionClosed:
+            return
+
+        # One reply per message, sent back in the order the messages arrived
+        replies = [None] * len(messages)
+        images = []
+        image_slots = []
+        for i, message in enumerate(messages):
+            try:
+                img = decode_message(message)
+            except Exception as e:
+                replies[i] = {"error": str(e)}
                 continue
 
-            img = decode_image_from_base64(img_b64)
             if img is None:
-                await websocket.send(json.dumps({"error": "Invalid image data"}))
+                replies[i] = {"error": "Invalid image data"}
                 continue
 
-            # Select next GPU inferencer for the specific model
-            gpu_index = next(gpu_cycle)
-            inferencer = inferencers[model_name][gpu_index]
+            images.append(img)
+            image_slots.append(i)
 
-            # Run inference
-            result_generator = inferencer(img, return_vis=False)
-            result = next(result_generator)
+        if images:
+            try:
+                # Select next GPU inferencer for the specific model
+                gpu_index = next(gpu_cycle)
+                inferencer = inferencers[model_name][gpu_index]
 
-            preds = result.get("predictions", None)
-            if not preds or not isinstance(preds, list) or len(preds[0]) == 0:
-                await websocket.send(json.dumps({"error": "No person detected"}))
-                continue
+                # Run inference on the whole batch at once
+                result_generator = inferencer(images, return_vis=False, batch_size=len(images))
+                preds = next(result_generator).get("predictions", None)
+                if not isinstance(preds, list) or len(preds) != len(images):
+                    raise ValueError("Unexpected prediction output")
 
-            # Extract keypoints and scores separately, then combine them
-            prediction = preds[0][0]
-            keypoints_xy = prediction.get("keypoints", None)
-            keypoint_scores = prediction.get("keypoint_scores", None)
-            
-            if keypoints_xy is None or keypoint_scores is None:
-                await websocket.send(json.dumps({"error": "Invalid keypoint data"}))
-                continue
-                
-            # Convert to numpy arrays and combine [x, y, score] format
-            keypoints_xy = np.array(keypoints_xy)
-            keypoint_scores = np.array(keypoint_scores)
-            
-            if keypoints_xy.shape[0] != keypoint_scores.shape[0]:
-                await websocket.send(json.dumps({"error": "Keypoint data mismatch"}))
-                continue
-                
-            keypoints = np.column_stack([keypoints_xy, keypoint_scores])
-            posture_score, measurement, raw_scores_percent = posture_score_from_keypoints(keypoints)
-
-            await websocket.send(
-                json.dumps(
-                    {
-                        "keypoints": keypoints.tolist(),  # Convert numpy array to list for JSON serialization
-                        "posture_score": posture_score,
-                        "raw_scores_percent": raw_scores_percent,
-                        "measurements": measurement,
-                    }
-                )
-            )
+                for slot, instances in zip(image_slots, preds):
+                    try:
+                        replies[slot] = build_inference_reply(instances)
+                    except Exception as e:
+                        replies[slot] = {"error": str(e)}
 
-        except Exception as e:
-            await websocket.send(json.dumps({"error": str(e)}))
+            except Exception as e:
+                for slot in image_slots:
+                    replies[slot] = {"error": str(e)}
+
+        try:
+            for reply in replies:
+                await websocket.send(encode_reply(reply))
+        except websockets.ConnectionClosed:
+            return
 
 
 async def start_model_server(model_name: str):
@@ -754,6 +849,9 @@ async def start_model_server(model_name: str):
 
 
 async def main():
+    print("Loading models...")
+    load_inferencers()
+
     print("Starting WebSocket servers for all models...")
     # Start a server for each model in MODEL_CONFIGS
     try: